@@ -3,48 +3,68 @@
 import html
 import genanki
 
-from config import FLASHCARD_MODEL, FLASHCARD_DECK_ID
+from config import get_flashcard_model, FLASHCARD_DECK_ID, WRITE_BUFFER_SIZE, PACKAGE_WRITE_BUFFER_SIZE
 from models import FlashcardSet
 
 
-def export_to_anki(flashcard_set: FlashcardSet, deck_name: str, output_file: str) -> None:
+def export_to_anki(
+    flashcard_set: FlashcardSet,
+    deck_name: str,
+    output_file: str,
+    package: genanki.Package | None = None
+) -> None:
     """
     Export flashcards to an Anki package (.apkg) file.
     
     Following genanki best practices:
     - Using hardcoded model_id and deck_id for consistency
     - HTML-escaping field content to handle special characters
+    
+    If `package` is given, the deck is appended to it instead and nothing is
+    written; call write_anki_package once after all decks have been added.
     """
     print(f"Creating Anki deck: {deck_name}...")
     
-    # Create deck with hardcoded ID
+    # Create deck with hardcoded ID; decks sharing a package each need their
+    # own ID, so later ones are offset by their position in the package
     deck = genanki.Deck(
-        FLASHCARD_DECK_ID,
+        FLASHCARD_DECK_ID + (len(package.decks) if package else 0),
         deck_name
     )
     
-    # Add flashcards as notes
-    for fc in flashcard_set.flashcards:
-        # HTML-escape the fields to handle special characters like <, >, &
-        # This is important per the genanki README
-        question_escaped = html.escape(fc.question)
-        answer_escaped = html.escape(fc.answer)
-        
-        note = genanki.Note(
-            model=FLASHCARD_MODEL,
-            fields=[question_escaped, answer_escaped]
-        )
-        deck.add_note(note)
+    # Add flashcards as notes in one pass. HTML-escape the fields to handle
+    # special characters like <, >, & (important per the genanki README).
+    # Locals avoid repeated global/attribute lookups for large decks.
+    escape = html.escape
+    model = get_flashcard_model()
+    Note = genanki.Note
+    deck.notes.extend(
+        Note(model=model, fields=[escape(fc.question), escape(fc.answer)])
+        for fc in flashcard_set.flashcards
+    )
+    
+    if package is not None:
+        package.decks.append(deck)
+        return
     
-    # Create and write package
-    genanki.Package(deck).write_to_file(output_file)
+    write_anki_package(genanki.Package(deck), output_file)
+
+
+def write_anki_package(package: genanki.Package, output_file: str) -> None:
+    """Write a package holding one or more decks to an .apkg file."""
+    # genanki hands the target to zipfile, which accepts a file object, so
+    # give it a large buffered writer
+    with open(output_file, "wb", buffering=PACKAGE_WRITE_BUFFER_SIZE) as f:
+        package.write_to_file(f)
     print(f"✓ Created Anki package: {output_file}")
 
 
 def save_flashcards_text(flashcard_set: FlashcardSet, output_file: str = "flashcards.txt") -> None:
     """Save flashcards to a text file in Question|Answer format."""
-    with open(output_file, "w", encoding="utf-8") as f:
-        for fc in flashcard_set.flashcards:
-            f.write(f"{fc.question}|{fc.answer}\n")
+    # Lines stream through the large write buffer, so the whole file is never
+    # held in memory as one string but still goes out in few syscalls.
+    # newline="\n" skips newline translation and gives the same file on every OS
+    with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE, newline="\n") as f:
+        f.writelines(f"{fc.question}|{fc.answer}\n" for fc in flashcard_set.flashcards)
     print(f"✓ Text format saved to: {output_file}")
 
@@ -0,0 +1,36 @@
+"""Cheap local checks for obvious flashcard problems (no LLM call)."""
+
+import hashlib
+
+from models import FlashcardSet
+
+# Questions opening with these words can usually be answered yes/no
+YES_NO_PREFIXES = ("is ", "are ", "do ", "does ", "can ", "was ", "were ", "will ", "should ")
+# Questions longer than this usually bundle several concepts
+MAX_QUESTION_LENGTH = 200
+
+
+def heuristic_issues(flashcard_set: FlashcardSet) -> list[str]:
+    """
+    Flag yes/no questions, empty answers, overlong questions and duplicate
+    answers. An empty list means nothing obviously wrong was found - not that
+    the deck is good.
+    """
+    issues = []
+    seen_answers = {}
+    for i, fc in enumerate(flashcard_set.flashcards, start=1):
+        question = fc.question.strip()
+        answer = fc.answer.strip()
+        if question.lower().startswith(YES_NO_PREFIXES):
+            issues.append(f"Card {i}: yes/no question")
+        if not answer:
+            issues.append(f"Card {i}: empty answer")
+        if len(question) > MAX_QUESTION_LENGTH:
+            issues.append(f"Card {i}: question longer than {MAX_QUESTION_LENGTH} characters")
+        
+        answer_key = hashlib.blake2b(answer.lower().encode("utf-8"), digest_size=8).digest()
+        if answer and answer_key in seen_answers:
+            issues.append(f"Card {i}: same answer as card {seen_answers[answer_key]}")
+        else:
+            seen_answers.setdefault(answer_key, i)
+    return issues
@@ -2,10 +2,9 @@
 
 from pathlib import Path
 from datetime import datetime
+import functools
 import logging
 import os
-from openai import OpenAI
-import genanki
 
 # Set up logging - will be reconfigured in main.py when output directory is created
 logging.basicConfig(
@@ -16,27 +15,129 @@ logging.basicConfig(
     ]
 )
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Connection pool limits for the shared HTTP client, sized for concurrent evaluations
+MAX_HTTP_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+# Retries for rate-limited (429) and transient errors. The SDK backs off
+# exponentially with jitter and honours Retry-After; its default of 2 is easily
+# exhausted by the concurrent chunk/evaluation requests
+API_MAX_RETRIES = int(os.getenv("FLASHCARD_API_MAX_RETRIES") or 5)
+
+
+@functools.cache
+def get_client():
+    """Return the OpenAI client shared by every module (created on first use)."""
+    import httpx
+    from openai import OpenAI, DefaultHttpxClient
+
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=API_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=MAX_HTTP_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            )
+        ),
+    )
+
+
+@functools.cache
+def get_async_client():
+    """Return the shared AsyncOpenAI client for concurrent evaluations (created on first use)."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=API_MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=MAX_HTTP_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            )
+        ),
+    )
+
+
+@functools.cache
+def cached_schema(model_cls) -> dict:
+    """Strict JSON schema for a pydantic response model, built once per class."""
+    from openai.lib._pydantic import to_strict_json_schema
+
+    return to_strict_json_schema(model_cls)
+
+
+# Maximum number of evaluation requests in flight at once (async evaluator)
+EVAL_CONCURRENCY = 8
+
+# Long PDFs can be split into page ranges that are generated from concurrently
+# (requires pypdf). 0 keeps the single whole-document request
+PDF_PAGES_PER_CHUNK = int(os.getenv("FLASHCARD_PDF_PAGES_PER_CHUNK") or 0)
+# Maximum number of chunk generation requests in flight at once
+GENERATION_CONCURRENCY = 4
+# PDF uploads kept with --keep-file are recorded here by content hash and reused
+# by later runs instead of uploading the same file again; "" disables reuse
+FILE_ID_CACHE_PATH = os.getenv("FLASHCARD_FILE_ID_CACHE", ".openai_files.json")
+# Kept uploads older than this are deleted from OpenAI on their next lookup
+FILE_ID_CACHE_TTL_DAYS = 7
+
+# Structured-output responses are already validated by OpenAI's strict json_schema
+# mode, so by default they are parsed without re-running pydantic validation.
+# Set FLASHCARD_TRUST_STRICT_SCHEMA=0 to validate them fully (e.g. when debugging)
+TRUST_STRICT_SCHEMA = os.getenv("FLASHCARD_TRUST_STRICT_SCHEMA", "1").lower() not in ("0", "false", "no")
+
+# Semantic (embedding-similarity) cache for deck evaluations. Off unless
+# FLASHCARD_SEMANTIC_CACHE_THRESHOLD is set to a cosine similarity such as 0.95
+EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("FLASHCARD_SEMANTIC_CACHE_THRESHOLD") or 0)
+
+# Buffer size for output files, so large decks/evaluations are written in few syscalls
+WRITE_BUFFER_SIZE = 1 << 16
+# Larger buffer for .apkg zip output, which is written in many small chunks
+PACKAGE_WRITE_BUFFER_SIZE = 1 << 20
+
+# Token budget for source material included in DSPy adaptation prompts (~5000 characters)
+SOURCE_MATERIAL_MAX_TOKENS = 1500
+# Token budgets for the source excerpt in judge prompts (deck and adaptation evaluation)
+EVAL_SOURCE_MAX_TOKENS = 1200
+EVAL_ADAPTATION_SOURCE_MAX_TOKENS = 750
 
 # IMPORTANT: These IDs should be hardcoded and unique
 # Generated once using: python3 -c "import random; print(random.randrange(1 << 30, 1 << 31))"
 FLASHCARD_MODEL_ID = 1607392319
 FLASHCARD_DECK_ID = 2059400110
 
-# Define the Anki model (note type) - this should be consistent
-FLASHCARD_MODEL = genanki.Model(
-    FLASHCARD_MODEL_ID,
-    'AI Generated Flashcard Model',
-    fields=[
-        {'name': 'Question'},
-        {'name': 'Answer'},
-    ],
-    templates=[
-        {
-            'name': 'Card 1',
-            'qfmt': '{{Question}}',
-            'afmt': '{{FrontSide}}<hr id="answer">{{Answer}}',
-        },
-    ])
+
+@functools.cache
+def get_flashcard_model():
+    """Return the Anki model (note type) - built once so it stays consistent."""
+    import genanki
+
+    return genanki.Model(
+        FLASHCARD_MODEL_ID,
+        'AI Generated Flashcard Model',
+        fields=[
+            {'name': 'Question'},
+            {'name': 'Answer'},
+        ],
+        templates=[
+            {
+                'name': 'Card 1',
+                'qfmt': '{{Question}}',
+                'afmt': '{{FrontSide}}<hr id="answer">{{Answer}}',
+            },
+        ])
+
+
+def __getattr__(name):
+    # Keep `from config import client` / `aclient` / `config.FLASHCARD_MODEL` working while
+    # deferring the openai/genanki imports until something actually uses them
+    if name == "client":
+        return get_client()
+    if name == "aclient":
+        return get_async_client()
+    if name == "FLASHCARD_MODEL":
+        return get_flashcard_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
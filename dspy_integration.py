@@ -5,67 +5,68 @@ This allows using optimized prompts when available, with fallback to original fu
 """
 
 import os
-import json
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 try:
     import dspy
 except ImportError:
     dspy = None
 
-from models import FlashcardSet, Critique
+from models import FlashcardSet, Critique, CritiquePrediction
+from json_io import loads as json_loads
+from token_utils import truncate_to_tokens
+from config import SOURCE_MATERIAL_MAX_TOKENS, get_client
 from openai_client import critique_flashcards, generate_gap_filling_cards
-from dspy_modules import CritiqueModule, AdaptationModule
-from dspy_metrics import critique_metric, adaptation_metric
+
+if TYPE_CHECKING:
+    from dspy_modules import CritiqueModule, AdaptationModule
 
 
 # Global flag to enable/disable DSPy optimization
 USE_DSPY = os.getenv("USE_DSPY_OPTIMIZATION", "false").lower() == "true"
 
-# Global modules (loaded once)
-_critique_module: Optional[CritiqueModule] = None
-_adaptation_module: Optional[AdaptationModule] = None
+# Global modules (loaded once; dspy_modules is imported on first use to keep startup cheap)
+_critique_module: Optional["CritiqueModule"] = None
+_adaptation_module: Optional["AdaptationModule"] = None
 _dspy_configured = False
 
 
+if dspy:
+    class OpenAILM(dspy.LM):
+        """Minimal DSPy LM backed by the OpenAI chat completions API."""
+        
+        def __init__(self, model_name: str):
+            super().__init__(model_name)
+            self.client = get_client()
+            self.model_name = model_name
+        
+        def __call__(self, prompt, **kwargs):
+            messages = []
+            if hasattr(prompt, 'messages'):
+                messages = prompt.messages
+            elif isinstance(prompt, str):
+                messages = [{"role": "user", "content": prompt}]
+            elif isinstance(prompt, list):
+                messages = prompt
+            
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                **kwargs
+            )
+            return response.choices[0].message.content
+
+
 def setup_dspy_if_needed(model: str = "gpt-4o"):
-    """Set up DSPy if not already configured."""
+    """Set up DSPy if not already configured (no-op after the first call)."""
     global _dspy_configured
     
-    if not dspy:
-        return False
-    
-    if not _dspy_configured:
-        from openai import OpenAI
-        import os
-        
-        class OpenAILM(dspy.LM):
-            def __init__(self, model_name: str):
-                super().__init__(model_name)
-                self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                self.model_name = model_name
-            
-            def __call__(self, prompt, **kwargs):
-                messages = []
-                if hasattr(prompt, 'messages'):
-                    messages = prompt.messages
-                elif isinstance(prompt, str):
-                    messages = [{"role": "user", "content": prompt}]
-                elif isinstance(prompt, list):
-                    messages = prompt
-                
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    **kwargs
-                )
-                return response.choices[0].message.content
-        
-        lm = OpenAILM(model)
-        dspy.configure(lm=lm)
-        _dspy_configured = True
+    if _dspy_configured or not dspy:
+        return bool(dspy)
     
+    dspy.configure(lm=OpenAILM(model))
+    _dspy_configured = True
     return True
 
 
@@ -82,6 +83,7 @@ def load_optimized_modules(module_dir: Path = Path("optimized_prompts")):
         return
     
     setup_dspy_if_needed()
+    from dspy_modules import CritiqueModule, AdaptationModule
     
     # Initialize modules (they'll use optimized prompts if available)
     # Note: In practice, you'd load the actual optimized module objects
@@ -104,36 +106,19 @@ def critique_flashcards_optimized(
     
     if _critique_module is None:
         setup_dspy_if_needed(model)
+        from dspy_modules import CritiqueModule
         _critique_module = CritiqueModule()
     
-    # Format flashcard text
-    flashcard_text = "\n".join([
-        f"{i+1}. Q: {fc.question} | A: {fc.answer}"
-        for i, fc in enumerate(flashcard_set.flashcards)
-    ])
-    
-    # Use DSPy module
-    result = _critique_module(flashcard_text=flashcard_text)
-    
-    # Parse result into Critique object
-    is_acceptable = getattr(result, 'is_acceptable', False)
-    if isinstance(is_acceptable, str):
-        is_acceptable = "true" in is_acceptable.lower() or "yes" in is_acceptable.lower()
+    # Use DSPy module. Cards keep the set's own numbering, since the caller
+    # revises this set with the critique's card references
+    result = _critique_module(flashcard_text=flashcard_set.prompt_text)
     
-    feedback = getattr(result, 'feedback', '')
-    issues_str = getattr(result, 'issues', '')
-    
-    # Parse issues
-    if isinstance(issues_str, str):
-        issues = [issue.strip() for issue in issues_str.split('\n') if issue.strip()]
-    else:
-        issues = issues_str if isinstance(issues_str, list) else []
-    
-    return Critique(
-        is_acceptable=bool(is_acceptable),
-        feedback=feedback,
-        issues=issues
-    )
+    # Parse result into Critique object (validators coerce string bool/issue fields)
+    return CritiquePrediction.model_validate({
+        "is_acceptable": getattr(result, 'is_acceptable', False),
+        "feedback": getattr(result, 'feedback', ''),
+        "issues": getattr(result, 'issues', ''),
+    })
 
 
 def generate_gap_filling_cards_optimized(
@@ -150,16 +135,14 @@ def generate_gap_filling_cards_optimized(
     
     if _adaptation_module is None:
         setup_dspy_if_needed(model)
+        from dspy_modules import AdaptationModule
         _adaptation_module = AdaptationModule()
     
-    # Format knowledge gaps
-    gap_summary = "\n".join([
-        f"- {gap}" for gap in gaps.critical_gaps
-    ])
+    # Format knowledge gaps in the analyzer's priority order (deterministic for
+    # the same analysis, so the prompt stays stable for caching)
+    gap_summary = "\n".join(f"- {gap}" for gap in gaps.critical_gaps)
     if gaps.weak_areas:
-        gap_summary += "\n" + "\n".join([
-            f"- {area}" for area in gaps.weak_areas
-        ])
+        gap_summary += "\n" + "\n".join(f"- {area}" for area in gaps.weak_areas)
     
     # Get source material
     source_material = text_content or ""
@@ -168,9 +151,8 @@ def generate_gap_filling_cards_optimized(
         # For now, use empty string
         source_material = ""
     
-    # Truncate if too long
-    if len(source_material) > 5000:
-        source_material = source_material[:5000] + "..."
+    # Truncate at a token boundary so the prompt (and its cache prefix) is stable
+    source_material = truncate_to_tokens(source_material, SOURCE_MATERIAL_MAX_TOKENS, model)
     
     # Use DSPy module
     result = _adaptation_module(
@@ -183,8 +165,7 @@ def generate_gap_filling_cards_optimized(
     
     try:
         if isinstance(new_cards_json, str):
-            import json
-            new_cards_data = json.loads(new_cards_json)
+            new_cards_data = json_loads(new_cards_json)
             flashcard_set = FlashcardSet.model_validate(new_cards_data)
             return flashcard_set.flashcards
         else:
@@ -1,9 +1,11 @@
 """Metric functions for DSPy optimization using existing evaluation system."""
 
-import json
-from models import FlashcardSet, Critique, AdaptiveUpdate
+import traceback
+
+from json_io import loads as json_loads
+from models import FlashcardSet, CritiquePrediction, AdaptiveUpdate
 from openai_client import revise_flashcards
-from evaluator import evaluate_flashcard_set, evaluate_adaptation
+from evaluator import evaluate_flashcard_set, evaluate_flashcard_sets, evaluate_adaptation
 
 
 def critique_metric(example, pred, trace=None):
@@ -23,25 +25,12 @@ def critique_metric(example, pred, trace=None):
     """
     flashcard_set = example.flashcard_set
     
-    # Parse the predicted critique
-    is_acceptable = getattr(pred, 'is_acceptable', False)
-    if isinstance(is_acceptable, str):
-        is_acceptable = "true" in is_acceptable.lower() or "yes" in is_acceptable.lower()
-    
-    feedback = getattr(pred, 'feedback', '')
-    issues_str = getattr(pred, 'issues', '')
-    
-    # Parse issues
-    if isinstance(issues_str, str):
-        issues = [issue.strip() for issue in issues_str.split('\n') if issue.strip()]
-    else:
-        issues = issues_str if isinstance(issues_str, list) else []
-    
-    critique = Critique(
-        is_acceptable=bool(is_acceptable),
-        feedback=feedback,
-        issues=issues
-    )
+    # Parse the predicted critique (validators coerce string bool/issue fields)
+    critique = CritiquePrediction.model_validate({
+        "is_acceptable": getattr(pred, 'is_acceptable', False),
+        "feedback": getattr(pred, 'feedback', ''),
+        "issues": getattr(pred, 'issues', ''),
+    })
     
     # If critique says it's acceptable, verify quality
     if critique.is_acceptable:
@@ -57,9 +46,11 @@ def critique_metric(example, pred, trace=None):
     try:
         revised = revise_flashcards(flashcard_set, critique)
         
-        # Evaluate original vs revised
-        original_eval = evaluate_flashcard_set(flashcard_set)
-        revised_eval = evaluate_flashcard_set(revised)
+        # Evaluate original vs revised in one judge call (cards scored before,
+        # e.g. the original deck on a later trial, come from the score cache)
+        original_eval, revised_eval = evaluate_flashcard_sets(
+            [flashcard_set, revised], ["original", "revised"]
+        )
         
         # Score based on improvement in overall_deck_score
         improvement = revised_eval.overall_deck_score - original_eval.overall_deck_score
@@ -105,7 +96,7 @@ def adaptation_metric(example, pred, trace=None):
             return 0.0
         
         if isinstance(new_cards_json, str):
-            new_cards_data = json.loads(new_cards_json)
+            new_cards_data = json_loads(new_cards_json)
         else:
             new_cards_data = new_cards_json
         
@@ -148,7 +139,6 @@ def adaptation_metric(example, pred, trace=None):
     
     except Exception as e:
         print(f"Error in adaptation_metric: {e}")
-        import traceback
         traceback.print_exc()
         return 0.0
 
@@ -8,8 +8,21 @@ except ImportError:
 
 if dspy:
     # Define DSPy signatures
+    #
+    # DSPy's adapter renders the signature docstring and field descriptions into
+    # the system message, then demos, then the input fields in declaration order.
+    # Keep the instructions static and declare inputs from most to least stable
+    # so repeated calls share the longest possible prefix for OpenAI prompt caching.
     class CritiqueSignature(dspy.Signature):
-        """Signature for critiquing flashcards."""
+        """Critique flashcards designed for long-term understanding and spaced repetition of lecture material.
+
+        Evaluate the flashcards against four atomic, independent quality metrics:
+        1. ATOMICITY: Each card focuses on ONE clear, atomic concept.
+        2. CLARITY: Questions and answers are unambiguous, precise, and complete.
+        3. LEARNING VALUE: Cards promote active recall and deep understanding rather than surface memorization.
+        4. ACCURACY: The information is factually correct and free from errors.
+
+        Identify specific issues related to these metrics and decide whether the flashcards are acceptable or need revision."""
         flashcard_text: str = dspy.InputField(desc="The flashcards to critique, formatted as questions and answers")
         is_acceptable: bool = dspy.OutputField(desc="Whether the flashcards are acceptable or need revision")
         feedback: str = dspy.OutputField(desc="Detailed feedback on the flashcards")
@@ -17,9 +30,14 @@ if dspy:
 
 
     class AdaptationSignature(dspy.Signature):
-        """Signature for generating adaptive flashcards."""
-        knowledge_gaps: str = dspy.InputField(desc="Description of knowledge gaps to address")
+        """Generate targeted flashcards that fill a student's identified knowledge gaps.
+
+        Each card should address a specific gap, focus on one atomic concept, be clear and complete,
+        promote active recall, and be factually accurate with respect to the source material."""
+        # Source material is identical across calls for the same document, so it
+        # precedes the per-session knowledge gaps
         source_material: str = dspy.InputField(desc="Source material to reference (truncated if long)")
+        knowledge_gaps: str = dspy.InputField(desc="Description of knowledge gaps to address")
         new_flashcards: str = dspy.OutputField(desc="New flashcards in JSON format matching FlashcardSet schema")
 
 
@@ -4,8 +4,9 @@ Loads saved flashcard sets and runs LLM-as-a-judge evaluations.
 """
 
 import argparse
-import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from models import (
@@ -17,15 +18,16 @@ from models import (
     AdaptationEvaluation,
 )
 from evaluator import evaluate_flashcard_set, evaluate_adaptation
+from evaluator_batch import submit_eval_batch, collect_eval_batch
+from json_io import read_json, write_json
+import llm_cache
 
 
 def load_json_file(file_path: Path, model_class):
     """Load and parse a JSON file into a Pydantic model."""
     if not file_path.exists():
         return None
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return model_class.model_validate(data)
+    return model_class.model_validate(read_json(file_path))
 
 
 def main():
@@ -38,6 +40,7 @@ Examples:
   python evaluate.py evaluation_data/20241101_120000
   python evaluate.py evaluation_data/20241101_120000 --model gpt-4o-mini
   python evaluate.py evaluation_data/20241101_120000 --stages initial revised adapted
+  python evaluate.py evaluation_data/20241101_120000 --batch
         """
     )
     
@@ -62,6 +65,43 @@ Examples:
         help="Which stages to evaluate (default: all stages)"
     )
     
+    parser.add_argument(
+        "--per-card",
+        action="store_true",
+        help="Score each flashcard in its own concurrent request instead of one request per deck"
+    )
+    
+    parser.add_argument(
+        "--cards-per-request",
+        type=int,
+        default=None,
+        help="Score each deck in concurrent shards of this many flashcards"
+    )
+    
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream whole-deck judge responses and log progress as each card is scored"
+    )
+    
+    parser.add_argument(
+        "--split-adaptation",
+        action="store_true",
+        help="Judge gap-filling and card removals in two concurrent requests"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Judge the initial/revised decks through the OpenAI Batch API (half price, may take hours)"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached judge responses and always call the API (same as FLASHCARD_NO_CACHE=1)"
+    )
+    
     parser.add_argument(
         "--output-dir",
         type=str,
@@ -71,6 +111,9 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.no_cache:
+        llm_cache.CACHE_ENABLED = False
+    
     # Set up logging
     logging.basicConfig(
         level=logging.INFO,
@@ -89,8 +132,7 @@ Examples:
         print(f"Error: Metadata file not found: {metadata_path}")
         return 1
     
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    metadata = read_json(metadata_path)
     
     print(f"\nEvaluating flashcard sets from: {eval_data_dir}")
     print(f"Source: {metadata.get('source_file', 'Unknown')}")
@@ -110,83 +152,125 @@ Examples:
         print("Please ensure source_text.txt exists in the evaluation data directory.")
         file_id = None
     
-    # Evaluate each stage
-    initial_eval = None
-    revised_eval = None
-    adapted_eval = None
-    adaptation_eval = None
+    # Evaluate each stage. Stages share no data and each is bound by OpenAI
+    # latency, so they run concurrently on a small thread pool.
+    print_lock = threading.Lock()
+    
+    def report(message: str) -> None:
+        """Print without interleaving output from concurrent stages."""
+        with print_lock:
+            print(message)
     
-    if "initial" in args.stages:
+    def eval_initial():
         initial_path = eval_data_dir / "flashcards_initial.json"
         initial_flashcards = load_json_file(initial_path, FlashcardSet)
-        if initial_flashcards:
-            print("Evaluating Stage 1: Initial Generation...")
-            initial_eval = evaluate_flashcard_set(
-                initial_flashcards,
-                file_id=file_id,
-                text_content=text_content,
-                stage_name="Initial Generation",
-                model=args.model
-            )
-        else:
-            print(f"Warning: {initial_path} not found, skipping initial evaluation")
+        if not initial_flashcards:
+            report(f"Warning: {initial_path} not found, skipping initial evaluation")
+            return None
+        report("Evaluating Stage 1: Initial Generation...")
+        return evaluate_flashcard_set(
+            initial_flashcards,
+            file_id=file_id,
+            text_content=text_content,
+            stage_name="Initial Generation",
+            model=args.model,
+            per_card=args.per_card,
+            cards_per_request=args.cards_per_request,
+            stream=args.stream
+        )
     
-    if "revised" in args.stages:
+    def eval_revised():
         revised_path = eval_data_dir / "flashcards_revised.json"
         revised_flashcards = load_json_file(revised_path, FlashcardSet)
-        if revised_flashcards:
-            print("Evaluating Stage 2: After Critique + Revision...")
-            revised_eval = evaluate_flashcard_set(
-                revised_flashcards,
-                file_id=file_id,
-                text_content=text_content,
-                stage_name="After Critique + Revision",
-                model=args.model
-            )
-        else:
-            print(f"Warning: {revised_path} not found, skipping revised evaluation")
+        if not revised_flashcards:
+            report(f"Warning: {revised_path} not found, skipping revised evaluation")
+            return None
+        report("Evaluating Stage 2: After Critique + Revision...")
+        return evaluate_flashcard_set(
+            revised_flashcards,
+            file_id=file_id,
+            text_content=text_content,
+            stage_name="After Critique + Revision",
+            model=args.model,
+            per_card=args.per_card,
+            cards_per_request=args.cards_per_request,
+            stream=args.stream
+        )
     
-    if "adapted" in args.stages:
+    def eval_adapted():
+        # Stage 3: Only evaluate personalization (not quality metrics)
         adapted_path = eval_data_dir / "flashcards_adapted.json"
         adapted_flashcards = load_json_file(adapted_path, FlashcardSet)
-        if adapted_flashcards:
-            print("Evaluating Stage 3: After Adaptation...")
-            print("Note: Stage 3 focuses on personalization, not quality improvement.")
-            print("Evaluating personalization effectiveness only (not quality metrics)...")
-            
-            # Stage 3: Only evaluate personalization (not quality metrics)
-            # Load required data for adaptation evaluation
-            study_session_path = eval_data_dir / "study_session.json"
-            knowledge_gaps_path = eval_data_dir / "knowledge_gaps.json"
-            adaptive_update_path = eval_data_dir / "adaptive_update.json"
-            revised_path = eval_data_dir / "flashcards_revised.json"
-            
-            study_session = load_json_file(study_session_path, StudySession)
-            knowledge_gaps = load_json_file(knowledge_gaps_path, KnowledgeGaps)
-            adaptive_update = load_json_file(adaptive_update_path, AdaptiveUpdate)
-            original_revised = load_json_file(revised_path, FlashcardSet)
-            
-            # Don't evaluate quality metrics for adapted stage - it's about personalization
-            adapted_eval = None
-            
-            if study_session and knowledge_gaps and adaptive_update and original_revised:
-                print("Evaluating Adaptation Effectiveness (Personalization)...")
-                adaptation_eval = evaluate_adaptation(
-                    original_revised,
-                    adaptive_update,
-                    knowledge_gaps,
-                    study_session,
-                    file_id=file_id,
-                    text_content=text_content,
-                    model=args.model
-                )
+        if not adapted_flashcards:
+            report(f"Warning: {adapted_path} not found, skipping adapted evaluation")
+            return None
+        report("Evaluating Stage 3: After Adaptation...\n"
+               "Note: Stage 3 focuses on personalization, not quality improvement.\n"
+               "Evaluating personalization effectiveness only (not quality metrics)...")
+        
+        # Load required data for adaptation evaluation
+        study_session = load_json_file(eval_data_dir / "study_session.json", StudySession)
+        knowledge_gaps = load_json_file(eval_data_dir / "knowledge_gaps.json", KnowledgeGaps)
+        adaptive_update = load_json_file(eval_data_dir / "adaptive_update.json", AdaptiveUpdate)
+        original_revised = load_json_file(eval_data_dir / "flashcards_revised.json", FlashcardSet)
+        
+        if not (study_session and knowledge_gaps and adaptive_update and original_revised):
+            report("Warning: Missing data for adaptation effectiveness evaluation")
+            return None
+        
+        report("Evaluating Adaptation Effectiveness (Personalization)...")
+        return evaluate_adaptation(
+            original_revised,
+            adaptive_update,
+            knowledge_gaps,
+            study_session,
+            file_id=file_id,
+            text_content=text_content,
+            model=args.model,
+            split=args.split_adaptation
+        )
+    
+    stage_evaluators = {
+        "initial": eval_initial,
+        "revised": eval_revised,
+        "adapted": eval_adapted,
+    }
+    stages = list(dict.fromkeys(args.stages))
+    
+    results = {}
+    if args.batch:
+        # Deck stages are submitted together as one batch and awaited; the
+        # adaptation judge (if requested) still runs online below
+        batch_stages = [stage for stage in stages if stage in ("initial", "revised")]
+        batch_sets = {}
+        for stage in batch_stages:
+            stage_path = eval_data_dir / f"flashcards_{stage}.json"
+            flashcard_set = load_json_file(stage_path, FlashcardSet)
+            if flashcard_set:
+                batch_sets[stage] = flashcard_set
             else:
-                print("Warning: Missing data for adaptation effectiveness evaluation")
-                adaptation_eval = None
-        else:
-            print(f"Warning: {adapted_path} not found, skipping adapted evaluation")
-            adapted_eval = None
-            adaptation_eval = None
+                report(f"Warning: {stage_path} not found, skipping {stage} evaluation")
+        if batch_sets:
+            batch_id = submit_eval_batch(
+                list(batch_sets.values()),
+                file_id=file_id,
+                text_content=text_content,
+                model=args.model,
+                per_card=args.per_card
+            )
+            results.update(zip(batch_sets, collect_eval_batch(batch_id)))
+        stages = [stage for stage in stages if stage not in batch_stages]
+    
+    if stages:
+        with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+            futures = {executor.submit(stage_evaluators[stage]): stage for stage in stages}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    
+    initial_eval = results.get("initial")
+    revised_eval = results.get("revised")
+    # Don't evaluate quality metrics for adapted stage - it's about personalization
+    adaptation_eval = results.get("adapted")
     
     # Save evaluation results
     output_dir = Path(args.output_dir)
@@ -198,16 +282,14 @@ Examples:
     
     # Save individual evaluations as JSON
     if initial_eval:
-        with open(eval_output_dir / "evaluation_initial.json", "w", encoding="utf-8") as f:
-            json.dump(initial_eval.model_dump(), f, indent=2)
+        write_json(eval_output_dir / "evaluation_initial.json", initial_eval.model_dump())
         print(f"\nStage 1 Results:")
         if initial_eval.average_scores:
             for criterion, score in initial_eval.average_scores.items():
                 print(f"  {criterion.replace('_', ' ').title()}: {score:.2f}/10")
     
     if revised_eval:
-        with open(eval_output_dir / "evaluation_revised.json", "w", encoding="utf-8") as f:
-            json.dump(revised_eval.model_dump(), f, indent=2)
+        write_json(eval_output_dir / "evaluation_revised.json", revised_eval.model_dump())
         print(f"\nStage 2 Results:")
         if revised_eval.average_scores:
             for criterion, score in revised_eval.average_scores.items():
@@ -217,8 +299,7 @@ Examples:
     
     # Stage 3: Only report personalization metrics (not quality metrics)
     if adaptation_eval:
-        with open(eval_output_dir / "evaluation_adaptation.json", "w", encoding="utf-8") as f:
-            json.dump(adaptation_eval.model_dump(), f, indent=2)
+        write_json(eval_output_dir / "evaluation_adaptation.json", adaptation_eval.model_dump())
         
         print(f"\nStage 3 Results (Personalization):")
         print(f"  Overall Personalization Score: {adaptation_eval.overall_personalization:.2f}/10")
@@ -1,61 +1,117 @@
 """LLM-as-a-judge evaluation module for flashcard quality assessment."""
 
+import asyncio
+import functools
 import logging
-from openai.lib._pydantic import to_strict_json_schema
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
-from config import client
+from config import (
+    get_client,
+    get_async_client,
+    cached_schema,
+    EVAL_CONCURRENCY,
+    EVAL_SOURCE_MAX_TOKENS,
+    EVAL_ADAPTATION_SOURCE_MAX_TOKENS,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from json_io import ArrayItemScanner, parse_model_json
+from llm_cache import ResponseCache, make_key
+from semantic_cache import SemanticCache, embed_text, aembed_text
+from token_utils import truncate_to_tokens
 from models import (
+    Flashcard,
     FlashcardSet,
     FlashcardEvaluation,
     DeckEvaluation,
+    MultiDeckEvaluation,
     GapCardEvaluation,
     RemovalEvaluation,
     AdaptationEvaluation,
+    GapOnlyEvaluation,
+    RemovalOnlyEvaluation,
     KnowledgeGaps,
     StudySession,
     AdaptiveUpdate,
 )
 
 
-def _build_evaluation_prompt(flashcard_text: str, file_id: bool = False, text_content: str | None = None) -> str:
-    """Build the evaluation prompt with 4 metrics."""
-    per_card_metrics = """Evaluate each flashcard individually on the following four atomic criteria (1-10 scale). Each criterion is independent and non-overlapping:
+log = logging.getLogger(__name__)
 
-1. ATOMICITY: Does the card focus on ONE clear, atomic concept? Cards that combine multiple concepts or require multiple pieces of information should be split or simplified. Rate 1-10 based solely on whether it's one concept or multiple.
+# Strict response schemas, converted once at import instead of on every request
+_DECK_SCHEMA = cached_schema(DeckEvaluation)
+_CARD_SCHEMA = cached_schema(FlashcardEvaluation)
+_ADAPTATION_SCHEMA = cached_schema(AdaptationEvaluation)
+_MULTI_DECK_SCHEMA = cached_schema(MultiDeckEvaluation)
+_GAP_ONLY_SCHEMA = cached_schema(GapOnlyEvaluation)
+_REMOVAL_ONLY_SCHEMA = cached_schema(RemovalOnlyEvaluation)
 
-2. CLARITY: Are questions and answers unambiguous, precise, and complete? Avoid vague wording, ambiguous phrasing, or questions that could have multiple correct answers. Include necessary context for understanding. The answer should fully address the question without being excessively long. Rate 1-10 based solely on clarity and completeness.
+# Draft scores with any criterion in this (inclusive) range are re-judged by the
+# larger model in evaluate_flashcard_set_speculative
+SPECULATIVE_UNCERTAIN_BAND = (4, 7)
 
-3. LEARNING VALUE: Does the card promote active recall and deep understanding rather than surface memorization? Prefer "why" and "how" questions over "what" questions. Avoid yes/no questions, simple fact recall, or questions that test only memorization. Cards should require the learner to actively construct knowledge. Rate 1-10 based solely on learning value and active recall effectiveness.
+# Bump whenever the rubric, prompts or response schemas change; it is part of
+# every evaluation cache key, so old entries are simply never read again.
+EVAL_CACHE_VERSION = 4
 
-4. ACCURACY: Is the information in the flashcard factually correct and free from errors? Verify against the source material that all facts, definitions, and explanations are accurate. Rate 1-10 based solely on factual correctness."""
-    
-    if file_id:
-        return f"""Evaluate these flashcards for quality. The flashcards were generated from the attached document.
+# Per-card judge scores keyed by (version, model, source, question, answer)
+_card_score_cache = ResponseCache("card_scores", max_memory_items=4096)
+# Raw judge responses keyed by the full request (model, messages, schema)
+_response_cache = ResponseCache("eval_responses")
+# Deck judge responses for near-identical card text (opt-in, see config)
+_semantic_cache = SemanticCache("deck_evaluations", SEMANTIC_CACHE_THRESHOLD)
 
-OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
 
-Flashcards to evaluate:
-{flashcard_text}
+def _parse_card_evaluation(content: str) -> FlashcardEvaluation:
+    """Parse a single-card judge response (trusted fast path, see TRUST_STRICT_SCHEMA)."""
+    return parse_model_json(FlashcardEvaluation, content)
 
-{per_card_metrics}
 
-Provide detailed feedback for each flashcard explaining your ratings."""
-    elif text_content:
-        return f"""Evaluate these flashcards for quality. The flashcards were generated from the following source material:
+def _parse_deck_evaluation(content: str) -> DeckEvaluation:
+    """Parse a deck judge response (trusted fast path, see TRUST_STRICT_SCHEMA)."""
+    return parse_model_json(DeckEvaluation, content)
 
-OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
 
-SOURCE MATERIAL:
-{text_content[:5000]}...
+def _log_prompt_cache_usage(response) -> None:
+    """Log how much of the prompt was served from OpenAI's automatic prefix cache."""
+    usage = response.usage
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    if details is not None and details.cached_tokens is not None:
+        log.info("Prompt cache: %d/%d prompt tokens cached", details.cached_tokens, usage.prompt_tokens)
 
-Flashcards to evaluate:
-{flashcard_text}
 
-{per_card_metrics}
+def _chat_completion_content(request: dict) -> str:
+    """Run a chat completion (or return the cached response) and return its message content."""
+    key = make_key(EVAL_CACHE_VERSION, request)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+    response = get_client().chat.completions.create(**request)
+    _log_prompt_cache_usage(response)
+    content = response.choices[0].message.content
+    _response_cache.set(key, content)
+    return content
+
+
+async def _achat_completion_content(request: dict) -> str:
+    """Async version of _chat_completion_content."""
+    key = make_key(EVAL_CACHE_VERSION, request)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+    response = await get_async_client().chat.completions.create(**request)
+    _log_prompt_cache_usage(response)
+    content = response.choices[0].message.content
+    _response_cache.set(key, content)
+    return content
 
-Provide detailed feedback for each flashcard explaining your ratings."""
-    else:
-        per_card_metrics_no_source = """Evaluate each flashcard individually on the following four atomic criteria (1-10 scale). Each criterion is independent and non-overlapping:
+
+# Prompt text is laid out static-first: the fixed goal and rubric lead every
+# request and per-call content (source excerpt, then flashcards) comes last,
+# so OpenAI's automatic prompt caching can reuse the shared prefix.
+_EVALUATION_GOAL = "OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization."
+
+_EVALUATION_CRITERIA = """Evaluate each flashcard individually on the following four atomic criteria (1-10 scale). Each criterion is independent and non-overlapping:
 
 1. ATOMICITY: Does the card focus on ONE clear, atomic concept? Cards that combine multiple concepts or require multiple pieces of information should be split or simplified. Rate 1-10 based solely on whether it's one concept or multiple.
 
@@ -63,19 +119,45 @@ Provide detailed feedback for each flashcard explaining your ratings."""
 
 3. LEARNING VALUE: Does the card promote active recall and deep understanding rather than surface memorization? Prefer "why" and "how" questions over "what" questions. Avoid yes/no questions, simple fact recall, or questions that test only memorization. Cards should require the learner to actively construct knowledge. Rate 1-10 based solely on learning value and active recall effectiveness.
 
-4. ACCURACY: Is the information in the flashcard factually correct and free from errors? Since source material is not available, evaluate based on general knowledge and internal consistency. Rate 1-10 based solely on factual correctness."""
-        
-        return f"""Evaluate these flashcards for quality:
+4. ACCURACY: Is the information in the flashcard factually correct and free from errors? Verify against the source material that all facts, definitions, and explanations are accurate. Rate 1-10 based solely on factual correctness."""
+
+# Without a source the only difference is how ACCURACY is judged; that goes in
+# the dynamic suffix so the rubric stays byte-identical across all branches
+_NO_SOURCE_ACCURACY_NOTE = "Source material is not available for these flashcards. For ACCURACY, evaluate based on general knowledge and internal consistency."
 
-OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
+_STATIC_RUBRIC_PROMPT = f"""Evaluate these flashcards for quality.
 
-{flashcard_text}
+{_EVALUATION_GOAL}
 
-{per_card_metrics_no_source}
+{_EVALUATION_CRITERIA}
 
 Provide detailed feedback for each flashcard explaining your ratings."""
 
 
+def _evaluation_source_note(file_id: bool = False, text_content: str | None = None) -> str:
+    """The one prompt section that depends on the source: attached file, inline excerpt, or none."""
+    if file_id:
+        return "The flashcards were generated from the attached document."
+    if text_content:
+        # The source excerpt (token-bounded, memoized) is shared by every stage
+        # for a document, so it precedes the flashcards to extend the cacheable prefix
+        return f"""The flashcards were generated from the following source material:
+
+SOURCE MATERIAL:
+{truncate_to_tokens(text_content, EVAL_SOURCE_MAX_TOKENS)}"""
+    return _NO_SOURCE_ACCURACY_NOTE
+
+
+def _build_evaluation_prompt(flashcard_text: str, file_id: bool = False, text_content: str | None = None) -> str:
+    """Build the evaluation prompt with 4 metrics (static rubric first, dynamic content last)."""
+    return f"""{_STATIC_RUBRIC_PROMPT}
+
+{_evaluation_source_note(file_id, text_content)}
+
+Flashcards to evaluate:
+{flashcard_text}"""
+
+
 def _build_system_prompt() -> str:
     """Build the system prompt for evaluation."""
     return """You are an expert educational evaluator specializing in flashcard quality assessment for long-term learning and spaced repetition.
@@ -98,36 +180,27 @@ Rate each criterion independently on a 1-10 scale where:
 Provide detailed, constructive feedback for each flashcard explaining your ratings."""
 
 
-def evaluate_flashcard_set(
+_SYSTEM_PROMPT_DECK = _build_system_prompt()
+
+
+def _evaluation_messages(
     flashcard_set: FlashcardSet,
-    file_id: str | None = None,
-    text_content: str | None = None,
-    stage_name: str = "flashcard set",
-    model: str = "gpt-4o"
-) -> DeckEvaluation:
-    """
-    Evaluate a flashcard set using LLM-as-a-judge.
-    
-    Args:
-        flashcard_set: The flashcard set to evaluate
-        file_id: OpenAI file ID for PDF source material (if available)
-        text_content: Text content of source material (if available)
-        stage_name: Name of the evaluation stage (for context)
-        model: OpenAI model to use for evaluation
-        
-    Returns:
-        DeckEvaluation with per-card evaluations and aggregate scores
-    """
-    print(f"Evaluating {stage_name} with {model}...")
-    logging.info(f"Evaluating {stage_name}: {len(flashcard_set.flashcards)} flashcards")
-    
-    # Format flashcards for evaluation
-    flashcard_text = "\n".join([
-        f"Card {i+1}:\nQ: {fc.question}\nA: {fc.answer}\n"
-        for i, fc in enumerate(flashcard_set.flashcards)
-    ])
-    
-    # Build user content based on input type
+    file_id: str | None,
+    text_content: str | None
+) -> list[dict]:
+    """Build the system/user messages asking the judge to score the cards in flashcard_set."""
+    # Format flashcards for evaluation (cached on the set across stages/metrics)
+    return _evaluation_messages_for_text(flashcard_set.evaluation_text, file_id, text_content)
+
+
+def _evaluation_messages_for_text(
+    flashcard_text: str,
+    file_id: str | None,
+    text_content: str | None
+) -> list[dict]:
+    """Build the system/user messages asking the judge to score already-formatted flashcard_text."""
+    # Build user content based on input type; only PDFs need the file part
+    user_content = _build_evaluation_prompt(flashcard_text, file_id=bool(file_id), text_content=text_content)
     if file_id:
         user_content = [
             {
@@ -136,129 +209,548 @@ def evaluate_flashcard_set(
             },
             {
                 "type": "text",
-                "text": _build_evaluation_prompt(flashcard_text, file_id=True)
+                "text": user_content
             }
         ]
-    elif text_content:
-        user_content = _build_evaluation_prompt(flashcard_text, text_content=text_content)
-    else:
-        user_content = _build_evaluation_prompt(flashcard_text)
     
-    system_content = _build_system_prompt()
+    system_content = _SYSTEM_PROMPT_DECK
     
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content}
-        ],
-        response_format={
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def _deck_evaluation_request(
+    flashcard_set: FlashcardSet,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> dict:
+    """Build the chat.completions.create arguments that score every card in flashcard_set."""
+    return {
+        "model": model,
+        "messages": _evaluation_messages(flashcard_set, file_id, text_content),
+        "response_format": {
             "type": "json_schema",
             "json_schema": {
                 "name": "deck_evaluation",
-                "schema": to_strict_json_schema(DeckEvaluation),
+                "schema": _DECK_SCHEMA,
                 "strict": True
             }
         }
-    )
+    }
+
+
+def _card_evaluation_request(
+    flashcard: Flashcard,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> dict:
+    """Build the chat.completions.create arguments that score a single card."""
+    return {
+        "model": model,
+        "messages": _evaluation_messages(FlashcardSet(flashcards=[flashcard]), file_id, text_content),
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "flashcard_evaluation",
+                "schema": _CARD_SCHEMA,
+                "strict": True
+            }
+        }
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def _source_key(file_id: str | None, text_content: str | None) -> str | None:
+    """Cache-key stand-in for the source; the text is hashed once per run, not per call."""
+    return file_id or (make_key(text_content) if text_content else None)
+
+
+def _semantic_scope(
+    flashcard_set: FlashcardSet,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> str:
+    """Exact-match part of a semantic cache lookup: only the card text may differ."""
+    source_key = _source_key(file_id, text_content)
+    return make_key(EVAL_CACHE_VERSION, model, source_key, len(flashcard_set.flashcards))
+
+
+def _request_deck_evaluation(
+    flashcard_set: FlashcardSet,
+    file_id: str | None,
+    text_content: str | None,
+    model: str,
+    semantic: bool = True
+) -> tuple[DeckEvaluation, bool]:
+    """
+    Ask the judge model to score every card in flashcard_set (one request).
+    
+    Returns (evaluation, approximate): approximate is True when the scores came
+    from a semantic-cache hit, i.e. from a similar but different deck, so they
+    must not be stored as exact per-card scores. semantic=False skips the
+    semantic cache (used for shards, which all share one scope).
+    """
+    if not (semantic and _semantic_cache.enabled):
+        content = _chat_completion_content(_deck_evaluation_request(flashcard_set, file_id, text_content, model))
+        return _parse_deck_evaluation(content), False
+    
+    scope = _semantic_scope(flashcard_set, file_id, text_content, model)
+    embedding = embed_text(flashcard_set.evaluation_text)
+    content = _semantic_cache.lookup(embedding, scope)
+    if content is not None:
+        return _parse_deck_evaluation(content), True
+    content = _chat_completion_content(_deck_evaluation_request(flashcard_set, file_id, text_content, model))
+    _semantic_cache.add(embedding, scope, content)
+    return _parse_deck_evaluation(content), False
+
+
+async def _arequest_deck_evaluation(
+    flashcard_set: FlashcardSet,
+    file_id: str | None,
+    text_content: str | None,
+    model: str,
+    semantic: bool = True
+) -> tuple[DeckEvaluation, bool]:
+    """Async version of _request_deck_evaluation."""
+    if not (semantic and _semantic_cache.enabled):
+        content = await _achat_completion_content(_deck_evaluation_request(flashcard_set, file_id, text_content, model))
+        return _parse_deck_evaluation(content), False
+    
+    scope = _semantic_scope(flashcard_set, file_id, text_content, model)
+    embedding = await aembed_text(flashcard_set.evaluation_text)
+    content = _semantic_cache.lookup(embedding, scope)
+    if content is not None:
+        return _parse_deck_evaluation(content), True
+    content = await _achat_completion_content(_deck_evaluation_request(flashcard_set, file_id, text_content, model))
+    _semantic_cache.add(embedding, scope, content)
+    return _parse_deck_evaluation(content), False
+
+
+def _evaluate_one_card(
+    flashcard: Flashcard,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> FlashcardEvaluation:
+    """Score a single card in its own request (per-card mode)."""
+    content = _chat_completion_content(_card_evaluation_request(flashcard, file_id, text_content, model))
+    return _parse_card_evaluation(content)
+
+
+async def _aevaluate_one_card(
+    flashcard: Flashcard,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> FlashcardEvaluation:
+    """Async version of _evaluate_one_card."""
+    content = await _achat_completion_content(_card_evaluation_request(flashcard, file_id, text_content, model))
+    return _parse_card_evaluation(content)
+
+
+def _realign_scores(
+    pending_set: FlashcardSet,
+    new_scores: list[FlashcardEvaluation],
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> list[FlashcardEvaluation] | None:
+    """
+    Check that the judge returned one evaluation per pending card. If not, the
+    scores cannot be matched to cards, so every pending card is re-scored in
+    its own request; returns those scores, or None if new_scores already fit.
+    """
+    if len(new_scores) == len(pending_set.flashcards):
+        return None
+    log.warning("Judge returned %d evaluations for %d flashcards; re-scoring them one card per request",
+                len(new_scores), len(pending_set.flashcards))
+    with ThreadPoolExecutor(max_workers=EVAL_CONCURRENCY) as executor:
+        return list(executor.map(
+            lambda fc: _evaluate_one_card(fc, file_id, text_content, model),
+            pending_set.flashcards
+        ))
+
+
+async def _arealign_scores(
+    pending_set: FlashcardSet,
+    new_scores: list[FlashcardEvaluation],
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> list[FlashcardEvaluation] | None:
+    """Async version of _realign_scores."""
+    if len(new_scores) == len(pending_set.flashcards):
+        return None
+    log.warning("Judge returned %d evaluations for %d flashcards; re-scoring them one card per request",
+                len(new_scores), len(pending_set.flashcards))
+    return await gather_bounded(*[
+        _aevaluate_one_card(fc, file_id, text_content, model)
+        for fc in pending_set.flashcards
+    ])
+
+
+def _shard_flashcards(flashcard_set: FlashcardSet, cards_per_request: int) -> list[FlashcardSet]:
+    """Split flashcard_set into consecutive sets of at most cards_per_request cards."""
+    cards = flashcard_set.flashcards
+    return [
+        FlashcardSet(flashcards=cards[start:start + cards_per_request])
+        for start in range(0, len(cards), cards_per_request)
+    ]
+
+
+def _lookup_card_scores(
+    flashcard_set: FlashcardSet,
+    file_id: str | None,
+    text_content: str | None,
+    model: str,
+    prior_flashcards: FlashcardSet | None = None,
+    prior_evaluation: DeckEvaluation | None = None
+) -> tuple[list[str], dict[str, FlashcardEvaluation], FlashcardSet | None]:
+    """
+    Split flashcard_set into cached and pending cards.
     
-    evaluation = DeckEvaluation.model_validate_json(response.choices[0].message.content)
+    Scores come from prior_evaluation (for cards unchanged since
+    prior_flashcards) or else from the per-card score cache.
     
+    Returns (card_keys, cached_scores, pending_set); pending_set is None when
+    every card already has a cached score.
+    """
+    # Accuracy depends on the source, so it is part of the key
+    source_key = _source_key(file_id, text_content)
+    card_keys = [
+        make_key(EVAL_CACHE_VERSION, model, source_key, fc.question, fc.answer)
+        for fc in flashcard_set.flashcards
+    ]
+    prior_scores = {}
+    if prior_flashcards is not None and prior_evaluation is not None:
+        if len(prior_flashcards.flashcards) == len(prior_evaluation.flashcard_evaluations):
+            prior_scores = {
+                (fc.question, fc.answer): card_eval
+                for fc, card_eval in zip(prior_flashcards.flashcards, prior_evaluation.flashcard_evaluations)
+            }
+        else:
+            log.warning("Prior evaluation does not have one score per prior flashcard; ignoring it")
+    
+    cached_scores = {}
+    for fc, key in zip(flashcard_set.flashcards, card_keys):
+        prior = prior_scores.get((fc.question, fc.answer))
+        if prior is not None:
+            cached_scores[key] = prior
+            continue
+        cached = _card_score_cache.get(key)
+        if cached is not None:
+            cached_scores[key] = parse_model_json(FlashcardEvaluation, cached)
+    
+    if not cached_scores:
+        return card_keys, cached_scores, flashcard_set
+    
+    log.info("Reusing cached scores for %d of %d flashcards", len(cached_scores), len(card_keys))
+    pending_cards = [fc for fc, key in zip(flashcard_set.flashcards, card_keys) if key not in cached_scores]
+    return card_keys, cached_scores, FlashcardSet(flashcards=pending_cards) if pending_cards else None
+
+
+def _merge_card_scores(
+    card_keys: list[str],
+    cached_scores: dict[str, FlashcardEvaluation],
+    new_scores: list[FlashcardEvaluation],
+    approximate: bool = False
+) -> DeckEvaluation:
+    """
+    Cache fresh scores and merge them with cached ones back into deck order.
+    Approximate scores (semantic-cache hits) are merged but not cached per card.
+    new_scores must hold exactly one evaluation per uncached card, in order
+    (see _realign_scores).
+    """
+    pending_keys = [key for key in card_keys if key not in cached_scores]
+    if len(new_scores) != len(pending_keys):
+        raise ValueError(f"Got {len(new_scores)} evaluations for {len(pending_keys)} unscored flashcards")
+    
+    if approximate:
+        log.info("Scores came from a similar deck (semantic cache); not caching them per card")
+    else:
+        for key, card_eval in zip(pending_keys, new_scores):
+            _card_score_cache.set(key, card_eval.model_dump_json())
+    
+    scores = {**cached_scores, **dict(zip(pending_keys, new_scores))}
+    flashcard_evaluations = [scores[key] for key in card_keys]
+    return _finalize_deck_evaluation(DeckEvaluation(flashcard_evaluations=flashcard_evaluations))
+
+
+def _finalize_deck_evaluation(evaluation: DeckEvaluation) -> DeckEvaluation:
+    """Fill in average_scores and overall_deck_score from the per-card evaluations."""
     # Always compute averages from flashcard_evaluations (we never ask LLM for these)
     if evaluation.flashcard_evaluations:
-        # 4 metrics: atomicity, clarity, learning_value, accuracy
-        criteria = ["atomicity", "clarity", "learning_value", "accuracy"]
-        
-        evaluation.average_scores = {}
-        for criterion in criteria:
-            scores = [getattr(eval, criterion) for eval in evaluation.flashcard_evaluations]
-            evaluation.average_scores[criterion] = sum(scores) / len(scores) if scores else 0.0
+        # 4 metrics: atomicity, clarity, learning_value, accuracy - read in a
+        # single pass over the cards and transposed into per-criterion columns
+        criteria = ("atomicity", "clarity", "learning_value", "accuracy")
+        num_cards = len(evaluation.flashcard_evaluations)
+        columns = zip(*(
+            (card_eval.atomicity, card_eval.clarity, card_eval.learning_value, card_eval.accuracy)
+            for card_eval in evaluation.flashcard_evaluations
+        ))
+        evaluation.average_scores = {
+            criterion: sum(column) / num_cards
+            for criterion, column in zip(criteria, columns)
+        }
         
         # Calculate overall_deck_score as average of 4 metrics
-        evaluation.overall_deck_score = sum(evaluation.average_scores.values()) / len(evaluation.average_scores) if evaluation.average_scores else 0.0
+        evaluation.overall_deck_score = sum(evaluation.average_scores.values()) / len(criteria)
     else:
         # Ensure defaults if no evaluations
         if evaluation.average_scores is None:
             evaluation.average_scores = {}
         evaluation.overall_deck_score = 0.0
     
-    logging.info(f"Evaluation complete: Average scores computed for {len(evaluation.average_scores)} criteria")
-    logging.info(f"Overall deck score: {evaluation.overall_deck_score:.2f}/10")
+    log.info("Evaluation complete: Average scores computed for %d criteria", len(evaluation.average_scores))
+    log.info("Overall deck score: %.2f/10", evaluation.overall_deck_score)
     return evaluation
 
 
-def evaluate_adaptation(
-    original_flashcards: FlashcardSet,
-    adapted_update: AdaptiveUpdate,
-    knowledge_gaps: KnowledgeGaps,
-    study_session: StudySession,
+def evaluate_flashcard_set(
+    flashcard_set: FlashcardSet,
     file_id: str | None = None,
     text_content: str | None = None,
-    model: str = "gpt-4o"
-) -> AdaptationEvaluation:
+    stage_name: str = "flashcard set",
+    model: str = "gpt-4o",
+    per_card: bool = False,
+    cards_per_request: int | None = None,
+    prior_flashcards: FlashcardSet | None = None,
+    prior_evaluation: DeckEvaluation | None = None,
+    stream: bool = False
+) -> DeckEvaluation:
     """
-    Evaluate the adaptation stage: how well gaps were addressed and removals were appropriate.
+    Evaluate a flashcard set using LLM-as-a-judge.
+    
+    Cards already scored against the same source with the same model (in this
+    process or a previous run) are taken from the per-card score cache; only
+    the remaining cards are sent to the LLM. Passing the previous stage's
+    prior_flashcards and prior_evaluation also reuses its scores for cards
+    that did not change (useful when caching is disabled).
+    
+    With per_card=True each card is scored in its own small request (up to
+    EVAL_CONCURRENCY at once) instead of one request for the whole deck, which
+    keeps per-request output short and lets the cards decode in parallel.
+    cards_per_request=k does the same with shards of k cards per request.
+    With stream=True the single deck request is streamed and progress is
+    logged as each card's scores arrive.
     
     Args:
-        original_flashcards: Original flashcard set before adaptation
-        adapted_update: The adaptive update result
-        knowledge_gaps: Identified knowledge gaps
-        study_session: Study session with user ratings
+        flashcard_set: The flashcard set to evaluate
         file_id: OpenAI file ID for PDF source material (if available)
         text_content: Text content of source material (if available)
+        stage_name: Name of the evaluation stage (for context)
         model: OpenAI model to use for evaluation
+        per_card: Score each card in a separate concurrent request
+        cards_per_request: Score the deck in concurrent shards of this many cards
+        prior_flashcards: Flashcards scored by prior_evaluation (e.g. the previous stage)
+        prior_evaluation: Evaluation of prior_flashcards whose scores may be reused
+        stream: Stream the deck request, logging progress per scored card
         
     Returns:
-        AdaptationEvaluation with gap coverage and removal appropriateness scores
+        DeckEvaluation with per-card evaluations and aggregate scores
     """
-    print(f"Evaluating adaptation effectiveness with {model}...")
-    logging.info("Evaluating adaptation stage")
+    log.info("Evaluating %s with %s: %d flashcards", stage_name, model, len(flashcard_set.flashcards))
     
-    # Format new cards
-    new_cards_text = "\n".join([
-        f"New Card {i+1}:\nQ: {fc.question}\nA: {fc.answer}\n"
-        for i, fc in enumerate(adapted_update.cards_added)
-    ])
+    card_keys, cached_scores, pending_set = _lookup_card_scores(
+        flashcard_set, file_id, text_content, model, prior_flashcards, prior_evaluation
+    )
+    new_scores = []
+    approximate = False
+    if pending_set is not None and per_card:
+        with ThreadPoolExecutor(max_workers=EVAL_CONCURRENCY) as executor:
+            new_scores = list(executor.map(
+                lambda fc: _evaluate_one_card(fc, file_id, text_content, model),
+                pending_set.flashcards
+            ))
+    elif pending_set is not None and cards_per_request:
+        with ThreadPoolExecutor(max_workers=EVAL_CONCURRENCY) as executor:
+            shard_evaluations = executor.map(
+                lambda shard: _request_deck_evaluation(shard, file_id, text_content, model, semantic=False)[0],
+                _shard_flashcards(pending_set, cards_per_request)
+            )
+            new_scores = [card_eval for shard_eval in shard_evaluations for card_eval in shard_eval.flashcard_evaluations]
+    elif pending_set is not None and stream:
+        num_pending = len(pending_set.flashcards)
+        for card_eval in evaluate_flashcard_set_stream(pending_set, file_id, text_content, model):
+            new_scores.append(card_eval)
+            log.info("%s: scored %d/%d cards", stage_name, len(new_scores), num_pending)
+    elif pending_set is not None:
+        evaluation, approximate = _request_deck_evaluation(pending_set, file_id, text_content, model)
+        new_scores = evaluation.flashcard_evaluations
+    if pending_set is not None:
+        realigned = _realign_scores(pending_set, new_scores, file_id, text_content, model)
+        if realigned is not None:
+            new_scores, approximate = realigned, False
+    return _merge_card_scores(card_keys, cached_scores, new_scores, approximate)
+
+
+def evaluate_flashcard_set_stream(
+    flashcard_set: FlashcardSet,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o"
+):
+    """
+    Stream a deck evaluation, yielding each FlashcardEvaluation as soon as the
+    judge has finished generating it (sync version of aevaluate_flashcard_set_stream).
+    """
+    request = _deck_evaluation_request(flashcard_set, file_id, text_content, model)
+    key = make_key(EVAL_CACHE_VERSION, request)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        yield from _parse_deck_evaluation(cached).flashcard_evaluations
+        return
     
-    # Format removed cards with user ratings
-    removed_cards_text = []
-    for removed_card in adapted_update.cards_removed:
-        # Find the rating for this card
-        rating = None
-        for r in study_session.ratings:
-            if r.flashcard_index < len(original_flashcards.flashcards):
-                if original_flashcards.flashcards[r.flashcard_index].question == removed_card.question:
-                    rating = r.difficulty
-                    break
-        
-        removed_cards_text.append(
-            f"Removed Card:\nQ: {removed_card.question}\nA: {removed_card.answer}\n"
-            f"User Rating: {rating}/5 (1=know well, 5=very difficult)\n"
+    scanner = ArrayItemScanner()
+    chunks = []
+    for chunk in get_client().chat.completions.create(**request, stream=True):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        chunks.append(delta)
+        for item in scanner.feed(delta):
+            yield _parse_card_evaluation(item)
+    
+    _response_cache.set(key, "".join(chunks))
+
+
+def evaluate_flashcard_set_speculative(
+    flashcard_set: FlashcardSet,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    stage_name: str = "flashcard set",
+    draft_model: str = "gpt-4o-mini",
+    verify_model: str = "gpt-4o",
+    uncertain_band: tuple[int, int] = SPECULATIVE_UNCERTAIN_BAND
+) -> DeckEvaluation:
+    """
+    Two-stage evaluation: score every card with a cheap draft model, then
+    re-score with verify_model only the cards where any criterion falls in
+    uncertain_band (inclusive). Clear-cut draft scores are kept as they are.
+    
+    The draft scores the deck in one request and the uncertain cards are
+    verified together in another; evaluate_flashcard_set only falls back to
+    one request per card if the judge's evaluation count does not match.
+    """
+    draft = evaluate_flashcard_set(
+        flashcard_set, file_id, text_content, f"{stage_name} (draft)", draft_model
+    )
+    low, high = uncertain_band
+    uncertain = [
+        i for i, card_eval in enumerate(draft.flashcard_evaluations)
+        if any(
+            low <= score <= high
+            for score in (card_eval.atomicity, card_eval.clarity, card_eval.learning_value, card_eval.accuracy)
         )
+    ]
     
-    # Format identified gaps
-    all_gaps = knowledge_gaps.critical_gaps + knowledge_gaps.weak_areas
-    gaps_text = "\n".join([f"- {gap}" for gap in all_gaps])
+    num_cards = len(flashcard_set.flashcards)
+    acceptance_rate = 1 - len(uncertain) / num_cards if num_cards else 1.0
+    log.info("Speculative evaluation: %d/%d draft scores accepted (speculation_acceptance_rate=%.2f)",
+             num_cards - len(uncertain), num_cards, acceptance_rate)
+    if not uncertain:
+        return draft
     
-    # Build user content
-    if file_id:
-        user_content = [
-            {
-                "type": "file",
-                "file": {"file_id": file_id}
-            },
-            {
-                "type": "text",
-                "text": f"""Evaluate the adaptation effectiveness. The system identified knowledge gaps and generated new cards to address them, and removed cards the user rated as "know well" (rating 1).
+    verified = evaluate_flashcard_set(
+        FlashcardSet(flashcards=[flashcard_set.flashcards[i] for i in uncertain]),
+        file_id, text_content, f"{stage_name} (verify)", verify_model
+    )
+    flashcard_evaluations = list(draft.flashcard_evaluations)
+    for i, card_eval in zip(uncertain, verified.flashcard_evaluations):
+        flashcard_evaluations[i] = card_eval
+    return _finalize_deck_evaluation(DeckEvaluation(flashcard_evaluations=flashcard_evaluations))
 
-IDENTIFIED KNOWLEDGE GAPS:
-{gaps_text}
 
-NEW CARDS GENERATED TO ADDRESS GAPS:
-{new_cards_text}
+def evaluate_flashcard_sets(
+    flashcard_sets: list[FlashcardSet],
+    stage_names: list[str],
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o"
+) -> list[DeckEvaluation]:
+    """
+    Evaluate several stages' flashcard sets for the same source in one judge call.
+    
+    The decks are sent as "=== Stage: name ===" blocks after the shared rubric
+    and source, so the system prompt, rubric and source are paid for (and
+    round-tripped) once. Cards with cached scores are left out of the request.
+    A stage whose returned evaluation count does not match its cards is
+    re-evaluated on its own.
+    
+    Returns:
+        One DeckEvaluation per flashcard set, in the same order
+    """
+    log.info("Evaluating %d stages with %s in one request", len(flashcard_sets), model)
+    lookups = [
+        _lookup_card_scores(flashcard_set, file_id, text_content, model)
+        for flashcard_set in flashcard_sets
+    ]
+    pending = [i for i, (_, _, pending_set) in enumerate(lookups) if pending_set is not None]
+    
+    new_scores = {i: [] for i in range(len(flashcard_sets))}
+    approximate = set()
+    if len(pending) == 1:
+        i = pending[0]
+        evaluation, is_approximate = _request_deck_evaluation(lookups[i][2], file_id, text_content, model)
+        new_scores[i] = evaluation.flashcard_evaluations
+        if is_approximate:
+            approximate.add(i)
+    elif pending:
+        flashcard_text = "\n\n".join(
+            f"=== Stage: {stage_names[i]} ===\n{lookups[i][2].evaluation_text}"
+            for i in pending
+        )
+        messages = _evaluation_messages_for_text(flashcard_text, file_id, text_content)
+        messages.append({
+            "role": "user",
+            "content": f"The flashcards above form {len(pending)} separate decks (stages). "
+                       f"Return one deck evaluation per stage, in the order given, each with one evaluation per flashcard in that stage."
+        })
+        content = _chat_completion_content({
+            "model": model,
+            "messages": messages,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "multi_deck_evaluation",
+                    "schema": _MULTI_DECK_SCHEMA,
+                    "strict": True
+                }
+            }
+        })
+        deck_evaluations = parse_model_json(MultiDeckEvaluation, content).deck_evaluations
+        for position, i in enumerate(pending):
+            expected = len(lookups[i][2].flashcards)
+            returned = deck_evaluations[position].flashcard_evaluations if position < len(deck_evaluations) else []
+            if len(returned) != expected:
+                log.warning("Combined evaluation returned %d scores for %d flashcards in stage %r; evaluating it separately",
+                            len(returned), expected, stage_names[i])
+                evaluation, is_approximate = _request_deck_evaluation(lookups[i][2], file_id, text_content, model)
+                returned = evaluation.flashcard_evaluations
+                if is_approximate:
+                    approximate.add(i)
+            new_scores[i] = returned
+    
+    for i in pending:
+        realigned = _realign_scores(lookups[i][2], new_scores[i], file_id, text_content, model)
+        if realigned is not None:
+            new_scores[i] = realigned
+            approximate.discard(i)
+    
+    return [
+        _merge_card_scores(card_keys, cached_scores, new_scores[i], i in approximate)
+        for i, (card_keys, cached_scores, _) in enumerate(lookups)
+    ]
 
-REMOVED CARDS (user rated 1 = "know well"):
-{chr(10).join(removed_cards_text)}
+
+_ADAPTATION_INSTRUCTIONS = """Evaluate the adaptation effectiveness. The system identified knowledge gaps and generated new cards to address them, and removed cards the user rated as "know well" (rating 1).
 
 Evaluate ONLY personalization effectiveness (do NOT evaluate general card quality):
 
@@ -271,104 +763,175 @@ Evaluate ONLY personalization effectiveness (do NOT evaluate general card qualit
    - Focus ONLY on whether removal was appropriate based on student knowledge, NOT on card quality
 
 Provide detailed feedback explaining your personalization ratings."""
-            }
-        ]
-    elif text_content:
-        user_content = f"""Evaluate the adaptation effectiveness. The system identified knowledge gaps and generated new cards to address them, and removed cards the user rated as "know well" (rating 1).
 
-SOURCE MATERIAL:
-{text_content[:3000]}...
+_ADAPTATION_SYSTEM_PROMPT = """You are an expert educational evaluator assessing the effectiveness of adaptive learning interventions.
 
-IDENTIFIED KNOWLEDGE GAPS:
-{gaps_text}
-
-NEW CARDS GENERATED TO ADDRESS GAPS:
-{new_cards_text}
-
-REMOVED CARDS (user rated 1 = "know well"):
-{chr(10).join(removed_cards_text)}
+Your goal is to evaluate PERSONALIZATION effectiveness - how well the system adapted the deck to the student's needs.
 
-Evaluate ONLY personalization effectiveness (do NOT evaluate general card quality):
+Evaluate ONLY these two aspects:
 
-1. Gap-Filling Effectiveness: For each identified gap, rate how well the new cards address that specific gap (1-10 scale)
+1. Gap-Filling Effectiveness: How well do the newly generated flashcards address each identified knowledge gap?
    - Do the cards actually help fill the gap? Are they semantically aligned with what the student struggled with?
-   - Focus ONLY on whether the gap is addressed, NOT on card quality (atomicity, clarity, etc.)
-
-2. Removal Appropriateness: For each removed card, rate whether the removal was appropriate given the user's rating (1-10 scale)
-   - Was the card correctly removed because the student already knows it well?
-   - Focus ONLY on whether removal was appropriate based on student knowledge, NOT on card quality
+   - Rate 1-10 where 10 means the gap is fully and effectively addressed
+   - DO NOT evaluate general card quality (atomicity, clarity, learning_value, accuracy) - only evaluate gap-filling effectiveness
+   
+2. Removal Appropriateness: Were cards correctly removed based on what the student already knows?
+   - A card rated 1 ("know well") should generally be removed
+   - Rate 1-10 where 10 means removal was completely appropriate
+   - DO NOT evaluate card quality - only evaluate whether removal was appropriate based on student knowledge
 
-Provide detailed feedback explaining your personalization ratings."""
-    else:
-        user_content = f"""Evaluate the adaptation effectiveness. The system identified knowledge gaps and generated new cards to address them, and removed cards the user rated as "know well" (rating 1).
+Focus ONLY on personalization: gap-filling and removal appropriateness. General quality metrics are evaluated in earlier stages."""
 
-IDENTIFIED KNOWLEDGE GAPS:
-{gaps_text}
 
-NEW CARDS GENERATED TO ADDRESS GAPS:
-{new_cards_text}
+_GAP_SYSTEM_PROMPT = """You are an expert educational evaluator assessing the effectiveness of adaptive learning interventions.
 
-REMOVED CARDS (user rated 1 = "know well"):
-{chr(10).join(removed_cards_text)}
+Evaluate Gap-Filling Effectiveness: How well do the newly generated flashcards address each identified knowledge gap?
+   - Do the cards actually help fill the gap? Are they semantically aligned with what the student struggled with?
+   - Rate 1-10 where 10 means the gap is fully and effectively addressed
+   - DO NOT evaluate general card quality (atomicity, clarity, learning_value, accuracy) - only evaluate gap-filling effectiveness"""
 
-Evaluate ONLY personalization effectiveness (do NOT evaluate general card quality):
+_GAP_INSTRUCTIONS = """Evaluate the adaptation effectiveness. The system identified knowledge gaps and generated new cards to address them.
 
-1. Gap-Filling Effectiveness: For each identified gap, rate how well the new cards address that specific gap (1-10 scale)
+Gap-Filling Effectiveness: For each identified gap, rate how well the new cards address that specific gap (1-10 scale)
    - Do the cards actually help fill the gap? Are they semantically aligned with what the student struggled with?
    - Focus ONLY on whether the gap is addressed, NOT on card quality (atomicity, clarity, etc.)
 
-2. Removal Appropriateness: For each removed card, rate whether the removal was appropriate given the user's rating (1-10 scale)
+Provide detailed feedback explaining your personalization ratings."""
+
+_REMOVAL_SYSTEM_PROMPT = """You are an expert educational evaluator assessing the effectiveness of adaptive learning interventions.
+
+Evaluate Removal Appropriateness: Were cards correctly removed based on what the student already knows?
+   - A card rated 1 ("know well") should generally be removed
+   - Rate 1-10 where 10 means removal was completely appropriate
+   - DO NOT evaluate card quality - only evaluate whether removal was appropriate based on student knowledge"""
+
+_REMOVAL_INSTRUCTIONS = """Evaluate the adaptation effectiveness. The system removed cards the user rated as "know well" (rating 1).
+
+Removal Appropriateness: For each removed card, rate whether the removal was appropriate given the user's rating (1-10 scale)
    - Was the card correctly removed because the student already knows it well?
    - Focus ONLY on whether removal was appropriate based on student knowledge, NOT on card quality
 
 Provide detailed feedback explaining your personalization ratings."""
+
+
+def _adaptation_sections(
+    original_flashcards: FlashcardSet,
+    adapted_update: AdaptiveUpdate,
+    knowledge_gaps: KnowledgeGaps,
+    study_session: StudySession
+) -> tuple[str, str, str]:
+    """Format (gaps_text, new_cards_text, removed_cards_text) for the adaptation judge prompts."""
+    # Format new cards
+    new_cards_text = "\n".join(
+        f"New Card {i+1}:\nQ: {fc.question}\nA: {fc.answer}\n"
+        for i, fc in enumerate(adapted_update.cards_added)
+    )
+    
+    # Index ratings by question once (first rating for a question wins, as before)
+    question_to_rating = {}
+    num_original = len(original_flashcards.flashcards)
+    for r in study_session.ratings:
+        if r.flashcard_index < num_original:
+            question_to_rating.setdefault(original_flashcards.flashcards[r.flashcard_index].question, r.difficulty)
+    
+    # Format removed cards with user ratings
+    removed_cards_text = "\n".join(
+        f"Removed Card:\nQ: {removed_card.question}\nA: {removed_card.answer}\n"
+        f"User Rating: {question_to_rating.get(removed_card.question)}/5 (1=know well, 5=very difficult)\n"
+        for removed_card in adapted_update.cards_removed
+    )
+    
+    # Format identified gaps
+    gaps_text = "\n".join(f"- {gap}" for gap in chain(knowledge_gaps.critical_gaps, knowledge_gaps.weak_areas))
     
-    system_content = """You are an expert educational evaluator assessing the effectiveness of adaptive learning interventions.
+    return gaps_text, new_cards_text, removed_cards_text
 
-Your goal is to evaluate PERSONALIZATION effectiveness - how well the system adapted the deck to the student's needs.
 
-Evaluate ONLY these two aspects:
+def _adaptation_user_content(
+    instructions: str,
+    details: str,
+    file_id: str | None,
+    text_content: str | None
+) -> str | list[dict]:
+    """User message content: static instructions, then the source (if any), then details."""
+    # Source excerpt only when there is no attached file, as before
+    source_block = ""
+    if text_content and not file_id:
+        source_block = f"SOURCE MATERIAL:\n{truncate_to_tokens(text_content, EVAL_ADAPTATION_SOURCE_MAX_TOKENS)}\n\n"
+    prompt_text = f"{instructions}\n\n{source_block}{details}"
+    
+    if file_id:
+        return [
+            {
+                "type": "file",
+                "file": {"file_id": file_id}
+            },
+            {
+                "type": "text",
+                "text": prompt_text
+            }
+        ]
+    return prompt_text
 
-1. Gap-Filling Effectiveness: How well do the newly generated flashcards address each identified knowledge gap?
-   - Do the cards actually help fill the gap? Are they semantically aligned with what the student struggled with?
-   - Rate 1-10 where 10 means the gap is fully and effectively addressed
-   - DO NOT evaluate general card quality (atomicity, clarity, learning_value, accuracy) - only evaluate gap-filling effectiveness
-   
-2. Removal Appropriateness: Were cards correctly removed based on what the student already knows?
-   - A card rated 1 ("know well") should generally be removed
-   - Rate 1-10 where 10 means removal was completely appropriate
-   - DO NOT evaluate card quality - only evaluate whether removal was appropriate based on student knowledge
 
-Focus ONLY on personalization: gap-filling and removal appropriateness. General quality metrics are evaluated in earlier stages."""
+def _adaptation_evaluation_request(
+    original_flashcards: FlashcardSet,
+    adapted_update: AdaptiveUpdate,
+    knowledge_gaps: KnowledgeGaps,
+    study_session: StudySession,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> dict:
+    """Build the chat.completions.create arguments for evaluate_adaptation."""
+    gaps_text, new_cards_text, removed_cards_text = _adaptation_sections(
+        original_flashcards, adapted_update, knowledge_gaps, study_session
+    )
+    
+    # Build user content: static instructions first, then this adaptation's data
+    adaptation_details = f"""IDENTIFIED KNOWLEDGE GAPS:
+{gaps_text}
+
+NEW CARDS GENERATED TO ADDRESS GAPS:
+{new_cards_text}
+
+REMOVED CARDS (user rated 1 = "know well"):
+{removed_cards_text}"""
+    
+    user_content = _adaptation_user_content(_ADAPTATION_INSTRUCTIONS, adaptation_details, file_id, text_content)
+    system_content = _ADAPTATION_SYSTEM_PROMPT
     
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
+    return {
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_content},
             {"role": "user", "content": user_content}
         ],
-        response_format={
+        "response_format": {
             "type": "json_schema",
             "json_schema": {
                 "name": "adaptation_evaluation",
-                "schema": to_strict_json_schema(AdaptationEvaluation),
+                "schema": _ADAPTATION_SCHEMA,
                 "strict": True
             }
         }
-    )
-    
-    evaluation = AdaptationEvaluation.model_validate_json(response.choices[0].message.content)
-    
+    }
+
+
+def _finalize_adaptation_evaluation(evaluation: AdaptationEvaluation) -> AdaptationEvaluation:
+    """Fill in the gap/removal averages and overall_personalization."""
     # Calculate averages if not provided
     if evaluation.gap_evaluations:
-        gap_scores = [gap.personalization_score for gap in evaluation.gap_evaluations]
-        evaluation.average_gap_personalization = sum(gap_scores) / len(gap_scores) if gap_scores else 0.0
+        evaluation.average_gap_personalization = (
+            sum(gap.personalization_score for gap in evaluation.gap_evaluations) / len(evaluation.gap_evaluations)
+        )
     else:
         evaluation.average_gap_personalization = 0.0
     
     if evaluation.removal_evaluations:
-        removal_scores = [removal.personalization_score for removal in evaluation.removal_evaluations]
-        evaluation.average_removal_personalization = sum(removal_scores) / len(removal_scores) if removal_scores else 0.0
+        evaluation.average_removal_personalization = (
+            sum(removal.personalization_score for removal in evaluation.removal_evaluations) / len(evaluation.removal_evaluations)
+        )
     else:
         evaluation.average_removal_personalization = 0.0
     
@@ -382,8 +945,270 @@ Focus ONLY on personalization: gap-filling and removal appropriateness. General
     else:
         evaluation.overall_personalization = 0.0
     
-    logging.info(f"Adaptation evaluation complete: Gap personalization = {evaluation.average_gap_personalization:.2f}, "
-                 f"Removal personalization = {evaluation.average_removal_personalization:.2f}, "
-                 f"Overall personalization = {evaluation.overall_personalization:.2f}")
+    log.info("Adaptation evaluation complete: Gap personalization = %.2f, Removal personalization = %.2f, "
+             "Overall personalization = %.2f",
+             evaluation.average_gap_personalization,
+             evaluation.average_removal_personalization,
+             evaluation.overall_personalization)
     return evaluation
 
+
+def _gap_evaluation_request(
+    gaps_text: str,
+    new_cards_text: str,
+    file_id: str | None,
+    text_content: str | None,
+    model: str
+) -> dict:
+    """Build the request that judges gap-filling only (split adaptation evaluation)."""
+    details = f"""IDENTIFIED KNOWLEDGE GAPS:
+{gaps_text}
+
+NEW CARDS GENERATED TO ADDRESS GAPS:
+{new_cards_text}"""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": _GAP_SYSTEM_PROMPT},
+            {"role": "user", "content": _adaptation_user_content(_GAP_INSTRUCTIONS, details, file_id, text_content)}
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "gap_evaluation",
+                "schema": _GAP_ONLY_SCHEMA,
+                "strict": True
+            }
+        }
+    }
+
+
+def _removal_evaluation_request(removed_cards_text: str, model: str) -> dict:
+    """Build the request that judges removals only (needs no source material)."""
+    details = f"""REMOVED CARDS (user rated 1 = "know well"):
+{removed_cards_text}"""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": _REMOVAL_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{_REMOVAL_INSTRUCTIONS}\n\n{details}"}
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "removal_evaluation",
+                "schema": _REMOVAL_ONLY_SCHEMA,
+                "strict": True
+            }
+        }
+    }
+
+
+def _combine_split_adaptation(
+    gap_evaluations: list,
+    removal_evaluations: list
+) -> AdaptationEvaluation:
+    """Merge the two halves of a split adaptation evaluation and compute its scores."""
+    evaluation = _finalize_adaptation_evaluation(AdaptationEvaluation(
+        gap_evaluations=gap_evaluations,
+        removal_evaluations=removal_evaluations,
+        average_gap_personalization=0.0,
+        average_removal_personalization=0.0,
+        overall_personalization=0.0,
+        overall_adaptation_effectiveness=0
+    ))
+    # Deprecated field the combined prompt asked the judge for; derive it instead
+    evaluation.overall_adaptation_effectiveness = round(evaluation.overall_personalization)
+    return evaluation
+
+
+def evaluate_adaptation(
+    original_flashcards: FlashcardSet,
+    adapted_update: AdaptiveUpdate,
+    knowledge_gaps: KnowledgeGaps,
+    study_session: StudySession,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o",
+    split: bool = False
+) -> AdaptationEvaluation:
+    """
+    Evaluate the adaptation stage: how well gaps were addressed and removals were appropriate.
+    
+    Args:
+        original_flashcards: Original flashcard set before adaptation
+        adapted_update: The adaptive update result
+        knowledge_gaps: Identified knowledge gaps
+        study_session: Study session with user ratings
+        file_id: OpenAI file ID for PDF source material (if available)
+        text_content: Text content of source material (if available)
+        model: OpenAI model to use for evaluation
+        split: Judge gap-filling and removals in two concurrent, smaller requests
+        
+    Returns:
+        AdaptationEvaluation with gap coverage and removal appropriateness scores
+    """
+    log.info("Evaluating adaptation effectiveness with %s", model)
+    
+    if split:
+        gaps_text, new_cards_text, removed_cards_text = _adaptation_sections(
+            original_flashcards, adapted_update, knowledge_gaps, study_session
+        )
+        gap_request = _gap_evaluation_request(gaps_text, new_cards_text, file_id, text_content, model)
+        removal_request = _removal_evaluation_request(removed_cards_text, model)
+        # Skip a half entirely when there is nothing for it to judge
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            gap_future = executor.submit(_chat_completion_content, gap_request) if gaps_text else None
+            removal_future = executor.submit(_chat_completion_content, removal_request) if removed_cards_text else None
+            gap_evaluations = parse_model_json(GapOnlyEvaluation, gap_future.result()).gap_evaluations if gap_future else []
+            removal_evaluations = (
+                parse_model_json(RemovalOnlyEvaluation, removal_future.result()).removal_evaluations
+                if removal_future else []
+            )
+        return _combine_split_adaptation(gap_evaluations, removal_evaluations)
+    
+    content = _chat_completion_content(_adaptation_evaluation_request(
+        original_flashcards, adapted_update, knowledge_gaps, study_session,
+        file_id, text_content, model
+    ))
+    evaluation = parse_model_json(AdaptationEvaluation, content)
+    return _finalize_adaptation_evaluation(evaluation)
+
+
+async def aevaluate_flashcard_set(
+    flashcard_set: FlashcardSet,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    stage_name: str = "flashcard set",
+    model: str = "gpt-4o",
+    per_card: bool = False,
+    cards_per_request: int | None = None,
+    prior_flashcards: FlashcardSet | None = None,
+    prior_evaluation: DeckEvaluation | None = None
+) -> DeckEvaluation:
+    """Async version of evaluate_flashcard_set, for overlapping several evaluations."""
+    log.info("Evaluating %s with %s: %d flashcards", stage_name, model, len(flashcard_set.flashcards))
+    
+    card_keys, cached_scores, pending_set = _lookup_card_scores(
+        flashcard_set, file_id, text_content, model, prior_flashcards, prior_evaluation
+    )
+    new_scores = []
+    approximate = False
+    if pending_set is not None and per_card:
+        new_scores = await gather_bounded(*[
+            _aevaluate_one_card(fc, file_id, text_content, model)
+            for fc in pending_set.flashcards
+        ])
+    elif pending_set is not None and cards_per_request:
+        shard_evaluations = await gather_bounded(*[
+            _arequest_deck_evaluation(shard, file_id, text_content, model, semantic=False)
+            for shard in _shard_flashcards(pending_set, cards_per_request)
+        ])
+        new_scores = [card_eval for shard_eval, _ in shard_evaluations for card_eval in shard_eval.flashcard_evaluations]
+    elif pending_set is not None:
+        evaluation, approximate = await _arequest_deck_evaluation(pending_set, file_id, text_content, model)
+        new_scores = evaluation.flashcard_evaluations
+    if pending_set is not None:
+        realigned = await _arealign_scores(pending_set, new_scores, file_id, text_content, model)
+        if realigned is not None:
+            new_scores, approximate = realigned, False
+    return _merge_card_scores(card_keys, cached_scores, new_scores, approximate)
+
+
+async def aevaluate_adaptation(
+    original_flashcards: FlashcardSet,
+    adapted_update: AdaptiveUpdate,
+    knowledge_gaps: KnowledgeGaps,
+    study_session: StudySession,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o",
+    split: bool = False
+) -> AdaptationEvaluation:
+    """Async version of evaluate_adaptation."""
+    log.info("Evaluating adaptation effectiveness with %s", model)
+    
+    if split:
+        gaps_text, new_cards_text, removed_cards_text = _adaptation_sections(
+            original_flashcards, adapted_update, knowledge_gaps, study_session
+        )
+        
+        async def judge_gaps():
+            if not gaps_text:
+                return []
+            content = await _achat_completion_content(
+                _gap_evaluation_request(gaps_text, new_cards_text, file_id, text_content, model)
+            )
+            return parse_model_json(GapOnlyEvaluation, content).gap_evaluations
+        
+        async def judge_removals():
+            if not removed_cards_text:
+                return []
+            content = await _achat_completion_content(_removal_evaluation_request(removed_cards_text, model))
+            return parse_model_json(RemovalOnlyEvaluation, content).removal_evaluations
+        
+        gap_evaluations, removal_evaluations = await asyncio.gather(judge_gaps(), judge_removals())
+        return _combine_split_adaptation(gap_evaluations, removal_evaluations)
+    
+    content = await _achat_completion_content(_adaptation_evaluation_request(
+        original_flashcards, adapted_update, knowledge_gaps, study_session,
+        file_id, text_content, model
+    ))
+    evaluation = parse_model_json(AdaptationEvaluation, content)
+    return _finalize_adaptation_evaluation(evaluation)
+
+
+async def aevaluate_flashcard_set_stream(
+    flashcard_set: FlashcardSet,
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o"
+):
+    """
+    Stream a deck evaluation, yielding each FlashcardEvaluation as soon as the
+    judge has finished generating it (cards come in deck order).
+    
+    The complete response is stored in the response cache when the stream
+    ends, so a following evaluate_flashcard_set/aevaluate_flashcard_set call
+    for the same deck reuses it. Collect the yielded cards into a
+    DeckEvaluation to get the averages.
+    """
+    log.info("Streaming evaluation with %s: %d flashcards", model, len(flashcard_set.flashcards))
+    request = _deck_evaluation_request(flashcard_set, file_id, text_content, model)
+    key = make_key(EVAL_CACHE_VERSION, request)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        for card_eval in _parse_deck_evaluation(cached).flashcard_evaluations:
+            yield card_eval
+        return
+    
+    scanner = ArrayItemScanner()
+    chunks = []
+    stream = await get_async_client().chat.completions.create(**request, stream=True)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        chunks.append(delta)
+        for item in scanner.feed(delta):
+            yield _parse_card_evaluation(item)
+    
+    _response_cache.set(key, "".join(chunks))
+
+
+async def gather_bounded(*coros, limit: int = EVAL_CONCURRENCY) -> list:
+    """
+    Await coroutines concurrently with at most `limit` in flight, returning results in order.
+    
+    Example:
+        evaluations = await gather_bounded(*[aevaluate_flashcard_set(s) for s in sets])
+    """
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def run(coro):
+        async with semaphore:
+            return await coro
+    
+    return await asyncio.gather(*(run(coro) for coro in coros))
@@ -0,0 +1,154 @@
+"""OpenAI Batch API path for offline evaluation of many flashcard sets.
+
+Batch requests cost half as much as online requests and draw on a separate
+rate-limit pool, at the price of up to 24h latency - use this for regression
+runs and bulk re-evaluation, not interactive use.
+
+Usage:
+    batch_id = submit_eval_batch(flashcard_sets, text_content=source)
+    ...
+    evaluations = collect_eval_batch(batch_id)  # waits until the batch finishes
+"""
+
+import logging
+import time
+
+from config import get_client
+from evaluator import (
+    _card_evaluation_request,
+    _deck_evaluation_request,
+    _finalize_deck_evaluation,
+    _parse_card_evaluation,
+    _parse_deck_evaluation,
+)
+from json_io import dumps, loads
+from models import FlashcardSet, DeckEvaluation
+
+log = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+# Seconds between status checks while waiting for a batch
+BATCH_POLL_INTERVAL = 30
+# Batch states after which the status no longer changes
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def submit_eval_batch(
+    flashcard_sets: list[FlashcardSet],
+    file_id: str | None = None,
+    text_content: str | None = None,
+    model: str = "gpt-4o",
+    per_card: bool = False
+) -> str:
+    """
+    Submit evaluation requests for every flashcard set as one OpenAI batch.
+    
+    Args:
+        flashcard_sets: Flashcard sets to evaluate (all against the same source)
+        file_id: OpenAI file ID for PDF source material (if available)
+        text_content: Text content of source material (if available)
+        model: OpenAI model to use for evaluation
+        per_card: One request per card (custom_id "set{i}-card{j}") instead of one per set
+        
+    Returns:
+        The batch ID, to pass to collect_eval_batch
+    """
+    lines = []
+    for set_idx, flashcard_set in enumerate(flashcard_sets):
+        if per_card:
+            for card_idx, flashcard in enumerate(flashcard_set.flashcards):
+                lines.append(dumps({
+                    "custom_id": f"set{set_idx}-card{card_idx}",
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": _card_evaluation_request(flashcard, file_id, text_content, model)
+                }))
+        else:
+            lines.append(dumps({
+                "custom_id": f"set{set_idx}",
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": _deck_evaluation_request(flashcard_set, file_id, text_content, model)
+            }))
+    
+    client = get_client()
+    batch_file = client.files.create(
+        file=("evaluation_batch.jsonl", b"\n".join(lines) + b"\n"),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={
+            "kind": "flashcard_evaluation",
+            "num_sets": str(len(flashcard_sets)),
+            "per_card": str(per_card).lower()
+        }
+    )
+    
+    log.info("Submitted evaluation batch %s: %d sets, %d requests", batch.id, len(flashcard_sets), len(lines))
+    return batch.id
+
+
+def wait_for_batch(batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL):
+    """Poll the batch until it reaches a terminal state and return it."""
+    client = get_client()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_TERMINAL_STATES:
+            return batch
+        log.info("Batch %s is %s; checking again in %ss", batch_id, batch.status, poll_interval)
+        time.sleep(poll_interval)
+
+
+def collect_eval_batch(batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL) -> list[DeckEvaluation | None]:
+    """
+    Wait for an evaluation batch and rebuild one DeckEvaluation per submitted set.
+    
+    Returns a list in submission order; a set whose requests all failed is None.
+    Per-card results are reassembled in card order and averaged exactly like
+    evaluate_flashcard_set.
+    """
+    batch = wait_for_batch(batch_id, poll_interval)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch_id} finished with status {batch.status!r}")
+    
+    if batch.request_counts and batch.request_counts.failed:
+        log.warning("Batch %s: %d requests failed", batch_id, batch.request_counts.failed)
+    
+    num_sets = int(batch.metadata["num_sets"])
+    per_card = batch.metadata.get("per_card") == "true"
+    
+    # set index -> {card index: evaluation} (per-card) or list of evaluations (per-set)
+    results = {}
+    output = get_client().files.content(batch.output_file_id).content
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            log.error("Batch request %s failed: %s", record["custom_id"], record.get("error") or response.get("status_code"))
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        
+        if per_card:
+            set_part, card_part = record["custom_id"].split("-")
+            card_evals = results.setdefault(int(set_part[len("set"):]), {})
+            card_evals[int(card_part[len("card"):])] = _parse_card_evaluation(content)
+        else:
+            set_idx = int(record["custom_id"][len("set"):])
+            results[set_idx] = _parse_deck_evaluation(content).flashcard_evaluations
+    
+    evaluations = []
+    for set_idx in range(num_sets):
+        if set_idx not in results:
+            evaluations.append(None)
+            continue
+        flashcard_evaluations = results[set_idx]
+        if per_card:
+            flashcard_evaluations = [flashcard_evaluations[i] for i in sorted(flashcard_evaluations)]
+        evaluations.append(_finalize_deck_evaluation(DeckEvaluation(flashcard_evaluations=flashcard_evaluations)))
+    return evaluations
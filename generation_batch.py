@@ -0,0 +1,115 @@
+"""OpenAI Batch API path for generating initial decks from many documents.
+
+Batch requests cost half as much as online requests and draw on a separate
+rate-limit pool, at the price of up to 24h latency - use this for bulk or
+overnight runs over a whole course, not interactive use. Only the initial
+generation is batched; critique and revision still run online per document.
+
+Usage:
+    prepared_inputs, initial_sets = generate_flashcards_batch(["week1.pdf", "week2.txt"])
+"""
+
+import logging
+
+from config import get_client
+from evaluator_batch import BATCH_ENDPOINT, BATCH_COMPLETION_WINDOW, BATCH_POLL_INTERVAL, wait_for_batch
+from json_io import dumps, loads, parse_model_json
+from models import FlashcardSet
+from openai_client import prepare_input, cleanup_file, _generate_request
+
+log = logging.getLogger(__name__)
+
+
+def submit_generation_batch(file_ids: list[str | None], text_contents: list[str | None], model: str = "gpt-4o") -> str:
+    """
+    Submit one generation request per document as one OpenAI batch.
+
+    Args:
+        file_ids: OpenAI file ID per document (PDFs), or None
+        text_contents: Text content per document (text files), or None
+        model: OpenAI model to use for generation
+
+    Returns:
+        The batch ID, to pass to collect_generation_batch
+    """
+    lines = [
+        dumps({
+            "custom_id": f"doc{i}",
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": _generate_request(file_id, text_content, model)
+        })
+        for i, (file_id, text_content) in enumerate(zip(file_ids, text_contents))
+    ]
+
+    client = get_client()
+    batch_file = client.files.create(
+        file=("generation_batch.jsonl", b"\n".join(lines) + b"\n"),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={
+            "kind": "flashcard_generation",
+            "num_docs": str(len(lines))
+        }
+    )
+
+    log.info("Submitted generation batch %s (%s requests)", batch.id, len(lines))
+    return batch.id
+
+
+def collect_generation_batch(batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL) -> list[FlashcardSet | None]:
+    """
+    Wait for a generation batch and return one FlashcardSet per submitted
+    document, in submission order; a document whose request failed is None.
+    """
+    batch = wait_for_batch(batch_id, poll_interval)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch_id} finished with status {batch.status!r}")
+
+    results = {}
+    output = get_client().files.content(batch.output_file_id).content
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            log.error("Batch request %s failed: %s", record["custom_id"], record.get("error") or response.get("status_code"))
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        results[int(record["custom_id"][len("doc"):])] = parse_model_json(FlashcardSet, content)
+
+    return [results.get(i) for i in range(int(batch.metadata["num_docs"]))]
+
+
+def generate_flashcards_batch(
+    file_paths: list[str],
+    model: str = "gpt-4o",
+    poll_interval: float = BATCH_POLL_INTERVAL
+) -> tuple[list[tuple[str | None, str | None, bool]], list[FlashcardSet | None]]:
+    """
+    Generate the initial deck for every document through one batch and wait
+    for it.
+
+    Returns (prepared_inputs, initial_sets): the prepare_input result per
+    document, for create_flashcards to reuse instead of uploading again (it
+    then cleans the upload up unless kept), and the deck per document. The
+    uploads are only deleted here if the batch itself fails.
+    """
+    prepared_inputs = []
+    try:
+        for file_path in file_paths:
+            prepared_inputs.append(prepare_input(file_path))
+        file_ids = [file_id for file_id, _, _ in prepared_inputs]
+        text_contents = [text_content for _, text_content, _ in prepared_inputs]
+        batch_id = submit_generation_batch(file_ids, text_contents, model)
+        return prepared_inputs, collect_generation_batch(batch_id, poll_interval)
+    except BaseException:
+        for file_id, _, reused in prepared_inputs:
+            if file_id and not reused:
+                cleanup_file(file_id)
+        raise
@@ -0,0 +1,141 @@
+"""JSON helpers backed by orjson when installed, with a stdlib json fallback."""
+
+import functools
+import json
+import typing
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from pydantic import BaseModel
+
+from config import WRITE_BUFFER_SIZE, TRUST_STRICT_SCHEMA
+
+
+def loads(data: str | bytes):
+    """Parse a JSON document from str or bytes."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """Serialize obj as compact UTF-8 JSON bytes (one line, e.g. for JSONL)."""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_pretty(obj) -> bytes:
+    """Serialize obj as 2-space indented UTF-8 JSON bytes."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def _nested_models(model_cls: type[BaseModel]) -> dict[str, tuple[type[BaseModel], bool]]:
+    """Map field name -> (model class, is_list) for fields holding models or lists of models."""
+    nested = {}
+    for name, field in model_cls.model_fields.items():
+        annotation = field.annotation
+        is_list = typing.get_origin(annotation) is list
+        if is_list:
+            annotation = typing.get_args(annotation)[0]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            nested[name] = (annotation, is_list)
+    return nested
+
+
+def construct_model(model_cls: type[BaseModel], data: dict):
+    """Build model_cls (and nested models) from trusted data without validation."""
+    values = dict(data)
+    for name, (nested_cls, is_list) in _nested_models(model_cls).items():
+        value = values.get(name)
+        if value is None:
+            continue
+        if is_list:
+            values[name] = [construct_model(nested_cls, item) for item in value]
+        else:
+            values[name] = construct_model(nested_cls, value)
+    return model_cls.model_construct(**values)
+
+
+def parse_model_json(model_cls: type[BaseModel], content: str | bytes):
+    """
+    Parse a structured-output response into model_cls.
+    
+    Responses produced under OpenAI's strict json_schema mode already match the
+    schema, so with TRUST_STRICT_SCHEMA they are parsed with loads() and built
+    with construct_model (no validation). Otherwise they go through pydantic's
+    strict-mode validation. Either way the text is decoded by loads() (orjson).
+    """
+    data = loads(content)
+    if TRUST_STRICT_SCHEMA:
+        return construct_model(model_cls, data)
+    return model_cls.model_validate(data, strict=True)
+
+
+def read_json(file_path: str | Path):
+    """Read and parse a JSON file."""
+    return loads(Path(file_path).read_bytes())
+
+
+def write_json(file_path: str | Path, obj) -> None:
+    """Write obj to file_path as indented JSON in a single buffered write."""
+    with open(file_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(dumps_pretty(obj))
+
+
+class ArrayItemScanner:
+    """
+    Incrementally extract the items of the first array nested one level inside a
+    streamed JSON object, e.g. each element of {"items": [{...}, {...}], ...}.
+    
+    feed() takes the next text chunk and returns the raw JSON text of every item
+    completed by it, so callers can parse items before the document finishes.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._array_done = False
+        self._item: list[str] = []
+        self._item_start_depth = None
+
+    def feed(self, chunk: str) -> list[str]:
+        items = []
+        for char in chunk:
+            if self._item_start_depth is not None:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                # Depth 1 is the top-level object, 2 the array, 3 an item
+                if self._depth == 3 and not self._array_done and self._item_start_depth is None:
+                    self._item_start_depth = self._depth
+                    self._item = [char]
+            elif char in "}]":
+                if self._item_start_depth is not None and self._depth == self._item_start_depth:
+                    items.append("".join(self._item))
+                    self._item_start_depth = None
+                    self._item = []
+                elif self._depth == 2 and char == "]":
+                    self._array_done = True
+                self._depth -= 1
+        return items
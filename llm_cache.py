@@ -0,0 +1,130 @@
+"""Content-hash keyed caching for LLM results.
+
+Results are kept in a small in-process LRU and mirrored to JSON files on disk,
+so identical calls within a run and across runs skip the OpenAI round trip.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from pydantic import BaseModel
+
+# Directory for the on-disk cache; set FLASHCARD_CACHE_DIR="" to keep it in memory only
+CACHE_DIR = os.getenv("FLASHCARD_CACHE_DIR", ".llm_cache")
+# Set FLASHCARD_NO_CACHE=1 (or CACHE_ENABLED = False at runtime) to bypass all caches
+CACHE_ENABLED = os.getenv("FLASHCARD_NO_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+def _to_jsonable(value):
+    """Fallback serializer for make_key (pydantic models and other objects)."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return repr(value)
+
+
+def make_key(*parts) -> str:
+    """Stable SHA-256 hex digest of arbitrary (pydantic-aware) key parts."""
+    payload = json.dumps(parts, sort_keys=True, default=_to_jsonable, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-level string cache: in-memory LRU in front of a directory of JSON files."""
+
+    def __init__(self, namespace: str, cache_dir: str | None = CACHE_DIR, max_memory_items: int = 512):
+        self.namespace = namespace
+        self.max_memory_items = max_memory_items
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._dir = Path(cache_dir) / namespace if cache_dir else None
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for key, or None on a miss."""
+        if not CACHE_ENABLED:
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self._dir is None:
+            return None
+        try:
+            value = self._path(key).read_text(encoding="utf-8")
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key in memory and (if enabled) on disk."""
+        if not CACHE_ENABLED:
+            return
+        self._remember(key, value)
+        if self._dir is None:
+            return
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_text(value, encoding="utf-8")
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # Disk cache is best-effort; the in-memory copy still serves this run
+            pass
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+
+def cached_model_call(namespace: str, result_model: type[BaseModel]):
+    """
+    Decorator caching a function that returns a pydantic model.
+
+    The key is a hash of the function name and its (pydantic-dumped) arguments;
+    results round-trip through model_dump_json / model_validate_json. Works on
+    coroutine functions too.
+    """
+    cache = ResponseCache(namespace)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(func.__name__, args, kwargs)
+                cached = cache.get(key)
+                if cached is not None:
+                    return result_model.model_validate_json(cached)
+                result = await func(*args, **kwargs)
+                cache.set(key, result.model_dump_json())
+                return result
+
+            async_wrapper.cache = cache
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(func.__name__, args, kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                return result_model.model_validate_json(cached)
+            result = func(*args, **kwargs)
+            cache.set(key, result.model_dump_json())
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -5,11 +5,15 @@ Orchestrates the workflow and handles command-line argument parsing.
 
 import os
 import argparse
+import atexit
 import logging
-import json
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
 
+import genanki
+
 # Import models
 from models import FlashcardSet
 
@@ -17,14 +21,27 @@ from models import FlashcardSet
 from openai_client import (
     prepare_input,
     generate_flashcards,
+    generate_flashcards_chunked,
+    generate_and_refine_chunked,
     critique_flashcards,
     revise_flashcards,
+    critique_and_revise_flashcards,
+    critique_flashcards_per_card,
+    revise_flagged_flashcards,
     analyze_knowledge_gaps,
     cleanup_file,
+    purge_file_cache,
 )
-from anki_exporter import export_to_anki, save_flashcards_text
+from anki_exporter import export_to_anki, save_flashcards_text, write_anki_package
+from card_checks import heuristic_issues
+from generation_batch import generate_flashcards_batch
+from json_io import write_json
+from config import PDF_PAGES_PER_CHUNK
+import llm_cache
 from study_session import (
     conduct_study_session,
+    replay_study_session,
+    load_ratings,
     adaptive_update_flashcards,
     print_adaptive_summary,
 )
@@ -45,15 +62,39 @@ log_file = LOG_DIR / f"flashcard_generation_{timestamp}.log"
 eval_data_subdir = EVAL_DATA_DIR / timestamp
 eval_data_subdir.mkdir(exist_ok=True)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging. Records go through a queue to a background listener
+# thread that does the file and console writes, so logging calls in the
+# critique/revise loop never wait on I/O; the listener is flushed at exit.
+# The console shows bare messages (it replaces the progress prints), the
+# log file keeps timestamps and levels.
+log_handlers = [
+    logging.FileHandler(log_file, encoding="utf-8"),
+    logging.StreamHandler()
+]
+log_handlers[0].setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_handlers[1].setFormatter(logging.Formatter('%(message)s'))
+
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, *log_handlers)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+# The queue handler only merges the message args; timestamps and levels are
+# added by the listener's handlers. force=True replaces config's console handler
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+
+
+def log_flashcards(title: str, flashcard_set: FlashcardSet) -> None:
+    """Log every card as one DEBUG record; skipped entirely unless --verbose enabled DEBUG."""
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    card_lines = "\n".join(
+        f"  {i+1}. Q: {fc.question} | A: {fc.answer}"
+        for i, fc in enumerate(flashcard_set.flashcards)
+    )
+    logging.debug("%s:\n%s", title, card_lines)
 
 
 def create_flashcards(
@@ -62,7 +103,19 @@ def create_flashcards(
     model: str = "gpt-4o",
     max_iterations: int = 2,
     keep_file: bool = False,
-    enable_study_session: bool = False
+    enable_study_session: bool = False,
+    pages_per_chunk: int = PDF_PAGES_PER_CHUNK,
+    per_card_critique: bool = False,
+    preflight: bool = False,
+    anki_package=None,
+    critic_model: str | None = None,
+    reviser_model: str | None = None,
+    refine_chunks: bool = False,
+    initial_flashcards: FlashcardSet | None = None,
+    replay_ratings: list[int] | None = None,
+    single_call: bool = False,
+    prepared_input: tuple[str | None, str | None, bool] | None = None,
+    eval_dir: Path = eval_data_subdir
 ):
     """
     Main workflow for creating flashcards from a PDF or text file.
@@ -74,90 +127,157 @@ def create_flashcards(
         max_iterations: Maximum critique/revision iterations
         keep_file: Whether to keep uploaded file on OpenAI servers (only for PDFs)
         enable_study_session: Whether to enable interactive study session
+        pages_per_chunk: Generate from PDFs in concurrent chunks of this many pages (0 = whole document)
+        per_card_critique: Critique each card independently and revise only the flagged ones
+        preflight: After the first revision, accept decks that pass local checks without another critique
+        anki_package: genanki.Package to add the deck to instead of writing output.apkg (for multi-file runs)
+        critic_model: Model for critiques (default: model); escalated to model after two rejections in a row
+        reviser_model: Model for revisions (default: model)
+        refine_chunks: With pages_per_chunk, critique/revise each chunk as soon as it is generated
+            (pipelined across chunks) instead of critiquing the merged deck
+        initial_flashcards: Already generated deck (e.g. from a generation batch); skips generation
+        replay_ratings: Recorded study ratings (one per card) used instead of the interactive session
+        single_call: Critique and revise in one request per iteration (uses critic_model for both)
+        prepared_input: prepare_input result for file_path (e.g. from a generation batch); skips the upload
+        eval_dir: Directory for this run's evaluation data (one per input file in multi-file runs)
     """
     print(f"\n{'='*60}")
     print(f"Starting flashcard generation for: {file_path}")
-    print(f"Using model: {model}")
+    critic_model = critic_model or model
+    reviser_model = reviser_model or model
+    
+    print(f"Using model: {model} (critic: {critic_model}, reviser: {reviser_model})")
     print(f"Max iterations: {max_iterations}")
     print(f"{'='*60}\n")
     
     logging.info(f"Starting flashcard generation for: {file_path}")
-    logging.info(f"Using model: {model}, max_iterations: {max_iterations}")
+    logging.info(f"Using model: {model}, critic: {critic_model}, reviser: {reviser_model}, max_iterations: {max_iterations}")
     
+    eval_dir.mkdir(exist_ok=True)
     file_id = None
     text_content = None
+    reused_upload = False
     try:
         # Prepare input (upload PDF or read text file)
-        file_id, text_content = prepare_input(file_path)
+        file_id, text_content, reused_upload = prepared_input or prepare_input(file_path)
         
         # Save evaluation metadata
         metadata = {
             "source_file": file_path,
             "deck_name": deck_name,
             "model": model,
+            "critic_model": critic_model,
+            "reviser_model": reviser_model,
             "max_iterations": max_iterations,
             "timestamp": timestamp,
             "file_id": file_id if file_id else None,
             "has_text_content": text_content is not None,
             "study_session_enabled": enable_study_session
         }
-        metadata_path = eval_data_subdir / "evaluation_metadata.json"
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2)
+        metadata_path = eval_dir / "evaluation_metadata.json"
+        write_json(metadata_path, metadata)
         logging.info(f"Saved evaluation metadata to {metadata_path}")
         
         if text_content:
             # Save text content for evaluation
-            text_content_path = eval_data_subdir / "source_text.txt"
+            text_content_path = eval_dir / "source_text.txt"
             with open(text_content_path, "w", encoding="utf-8") as f:
                 f.write(text_content)
             logging.info(f"Saved source text to {text_content_path}")
         
-        flashcards = generate_flashcards(file_id=file_id, text_content=text_content, model=model)
+        refined_flashcards = None
+        if initial_flashcards is not None:
+            flashcards = initial_flashcards
+        elif file_id and pages_per_chunk and refine_chunks:
+            flashcards, refined_flashcards = generate_and_refine_chunked(
+                file_path,
+                pages_per_chunk,
+                max_iterations,
+                model=model,
+                critic_model=critic_model,
+                reviser_model=reviser_model
+            )
+        elif file_id and pages_per_chunk:
+            # The whole-document upload is still used by the later steps
+            flashcards = generate_flashcards_chunked(file_path, pages_per_chunk, model=model)
+        else:
+            flashcards = generate_flashcards(file_id=file_id, text_content=text_content, model=model)
         
-        print(f"✓ Generated {len(flashcards.flashcards)} flashcards\n")
-        logging.info(f"Generated {len(flashcards.flashcards)} initial flashcards")
+        logging.info("✓ Generated %d initial flashcards", len(flashcards.flashcards))
         
         # Save initial flashcards for evaluation
-        initial_flashcards_path = eval_data_subdir / "flashcards_initial.json"
-        with open(initial_flashcards_path, "w", encoding="utf-8") as f:
-            json.dump(flashcards.model_dump(), f, indent=2)
+        initial_flashcards_path = eval_dir / "flashcards_initial.json"
+        write_json(initial_flashcards_path, flashcards.model_dump())
         logging.info(f"Saved initial flashcards to {initial_flashcards_path}")
         
         # Log initial flashcards
-        logging.debug("Initial flashcards:")
-        for i, fc in enumerate(flashcards.flashcards):
-            logging.debug(f"  {i+1}. Q: {fc.question} | A: {fc.answer}")
+        log_flashcards("Initial flashcards", flashcards)
+        
+        if refined_flashcards is not None:
+            # Chunks were already critiqued and revised during generation
+            flashcards = refined_flashcards
+            logging.info("Refined chunks to %d flashcards", len(flashcards.flashcards))
+            log_flashcards("Revised flashcards", flashcards)
         
         # Critique and revise loop
-        for i in range(max_iterations):
-            print(f"Iteration {i+1}/{max_iterations}:")
-            logging.info(f"Iteration {i+1}/{max_iterations}")
-            critique = critique_flashcards(flashcards, model)
-            
-            if critique.is_acceptable:
-                print("✓ Flashcards approved!\n")
-                logging.info("Flashcards approved - no revision needed")
-                break
+        for i in range(0 if refined_flashcards is not None else max_iterations):
+            logging.info("Iteration %d/%d", i + 1, max_iterations)
+            if preflight and i > 0:
+                # The critic already reviewed this deck's predecessor; if the
+                # revision has no obvious problems, skip another LLM round trip
+                local_issues = heuristic_issues(flashcards)
+                if not local_issues:
+                    logging.info("✓ Revised flashcards pass local checks - critique skipped")
+                    break
+                logging.info("Local checks flagged: %s", ", ".join(local_issues))
             
-            print(f"⚠ Issues found: {', '.join(critique.issues)}")
-            logging.warning(f"Issues found: {', '.join(critique.issues)}")
-            logging.info(f"Critique feedback: {critique.feedback}")
+            if per_card_critique:
+                card_critiques = critique_flashcards_per_card(flashcards, critic_model)
+                flagged = [c for c in card_critiques.critiques if not c.is_acceptable]
+                if not flagged:
+                    logging.info("✓ Flashcards approved - no revision needed")
+                    break
+                
+                issues = [f"card {c.card_number}: {issue}" for c in flagged for issue in c.issues]
+                logging.warning("⚠ %d cards flagged: %s", len(flagged), ", ".join(issues))
+                
+                flashcards = revise_flagged_flashcards(flashcards, card_critiques, reviser_model)
+            else:
+                revision = None
+                if single_call:
+                    result = critique_and_revise_flashcards(flashcards, critic_model)
+                    critique = result.critique
+                    revision = result.revised_flashcards
+                else:
+                    critique = critique_flashcards(flashcards, critic_model)
+                
+                if critique.is_acceptable:
+                    logging.info("✓ Flashcards approved - no revision needed")
+                    break
+                
+                logging.warning("⚠ Issues found: %s", ", ".join(critique.issues))
+                logging.info("Critique feedback: %s", critique.feedback)
+                
+                if revision:
+                    flashcards = FlashcardSet(flashcards=revision)
+                else:
+                    # Separate call, or the combined response left out the revision
+                    flashcards = revise_flashcards(flashcards, critique, reviser_model)
             
-            flashcards = revise_flashcards(flashcards, critique, model)
+            # Reaching here a second time means the critic rejected two decks
+            # in a row; let the main model judge from now on in case a cheaper
+            # critic is being too strict to converge
+            if i > 0 and critic_model != model:
+                logging.info("Critic rejected twice in a row - escalating critique to %s", model)
+                critic_model = model
             
             # Log revised flashcards
-            logging.info(f"Revised to {len(flashcards.flashcards)} flashcards")
-            logging.debug("Revised flashcards:")
-            for j, fc in enumerate(flashcards.flashcards):
-                logging.debug(f"  {j+1}. Q: {fc.question} | A: {fc.answer}")
-            
-            print()
+            logging.info("Revised to %d flashcards", len(flashcards.flashcards))
+            log_flashcards("Revised flashcards", flashcards)
         
         # Save revised flashcards for evaluation
-        revised_flashcards_path = eval_data_subdir / "flashcards_revised.json"
-        with open(revised_flashcards_path, "w", encoding="utf-8") as f:
-            json.dump(flashcards.model_dump(), f, indent=2)
+        revised_flashcards_path = eval_dir / "flashcards_revised.json"
+        write_json(revised_flashcards_path, flashcards.model_dump())
         logging.info(f"Saved revised flashcards to {revised_flashcards_path}")
         
         # Store original flashcards
@@ -166,12 +286,13 @@ def create_flashcards(
         # Only export directly if study session not enabled
         if not enable_study_session:
             output_file = "output.apkg"
-            export_to_anki(flashcards, deck_name, output_file)
+            export_to_anki(flashcards, deck_name, output_file, package=anki_package)
             
-            print(f"\nTo import into Anki:")
-            print(f"1. Open Anki")
-            print(f"2. File → Import")
-            print(f"3. Select {output_file}")
+            if anki_package is None:
+                print(f"\nTo import into Anki:")
+                print(f"1. Open Anki")
+                print(f"2. File → Import")
+                print(f"3. Select {output_file}")
             
             # Also save as text file
             save_flashcards_text(flashcards, "flashcards.txt")
@@ -182,21 +303,26 @@ def create_flashcards(
             
             logging.info(f"Completed! Created {len(flashcards.flashcards)} flashcards")
             logging.info(f"Log file saved to: {log_file}")
-            print(f"✓ Evaluation data saved to: {eval_data_subdir}")
+            print(f"✓ Evaluation data saved to: {eval_dir}")
         else:
-            # Study session mode - ask user
+            # Study session mode - ask user (unless replaying recorded ratings)
             print("\n" + "="*60)
-            response = input("Would you like to start a study session? (y/n): ").lower()
+            if replay_ratings is not None:
+                response = 'y'
+            else:
+                response = input("Would you like to start a study session? (y/n): ").lower()
             
             if response == 'y':
                 # Conduct session
-                session = conduct_study_session(original_flashcards)
+                if replay_ratings is not None:
+                    session = replay_study_session(original_flashcards, replay_ratings)
+                else:
+                    session = conduct_study_session(original_flashcards)
                 logging.info(f"Study session completed: {len(session.ratings)} ratings collected")
                 
                 # Save study session for evaluation
-                study_session_path = eval_data_subdir / "study_session.json"
-                with open(study_session_path, "w", encoding="utf-8") as f:
-                    json.dump(session.model_dump(), f, indent=2)
+                study_session_path = eval_dir / "study_session.json"
+                write_json(study_session_path, session.model_dump())
                 logging.info(f"Saved study session to {study_session_path}")
                 
                 # Analyze gaps
@@ -204,9 +330,8 @@ def create_flashcards(
                 logging.info(f"Knowledge gaps analyzed: {len(gaps.weak_areas)} weak areas identified")
                 
                 # Save knowledge gaps for evaluation
-                knowledge_gaps_path = eval_data_subdir / "knowledge_gaps.json"
-                with open(knowledge_gaps_path, "w", encoding="utf-8") as f:
-                    json.dump(gaps.model_dump(), f, indent=2)
+                knowledge_gaps_path = eval_dir / "knowledge_gaps.json"
+                write_json(knowledge_gaps_path, gaps.model_dump())
                 logging.info(f"Saved knowledge gaps to {knowledge_gaps_path}")
                 
                 # Adaptive update
@@ -215,22 +340,21 @@ def create_flashcards(
                 )
                 
                 # Save adapted flashcards for evaluation
-                adapted_flashcards_path = eval_data_subdir / "flashcards_adapted.json"
-                with open(adapted_flashcards_path, "w", encoding="utf-8") as f:
-                    json.dump(adaptive_result.final_flashcards.model_dump(), f, indent=2)
+                adapted_flashcards_path = eval_dir / "flashcards_adapted.json"
+                write_json(adapted_flashcards_path, adaptive_result.final_flashcards.model_dump())
                 logging.info(f"Saved adapted flashcards to {adapted_flashcards_path}")
                 
                 # Save adaptive update for evaluation
-                adaptive_update_path = eval_data_subdir / "adaptive_update.json"
-                with open(adaptive_update_path, "w", encoding="utf-8") as f:
-                    json.dump(adaptive_result.model_dump(), f, indent=2)
+                adaptive_update_path = eval_dir / "adaptive_update.json"
+                write_json(adaptive_update_path, adaptive_result.model_dump())
                 logging.info(f"Saved adaptive update to {adaptive_update_path}")
                 
                 # Export adaptive deck
                 export_to_anki(
                     adaptive_result.final_flashcards,
                     deck_name + " (Adaptive)",
-                    "output.apkg"
+                    "output.apkg",
+                    package=anki_package
                 )
                 
                 # Save gap report
@@ -250,13 +374,13 @@ def create_flashcards(
                 
                 logging.info(f"Adaptive deck created: {len(adaptive_result.final_flashcards.flashcards)} cards")
                 logging.info(f"Log file saved to: {log_file}")
-                print(f"✓ Evaluation data saved to: {eval_data_subdir}")
+                print(f"✓ Evaluation data saved to: {eval_dir}")
                 
                 return adaptive_result.final_flashcards
             else:
                 # User declined, export original
                 output_file = "output.apkg"
-                export_to_anki(original_flashcards, deck_name, output_file)
+                export_to_anki(original_flashcards, deck_name, output_file, package=anki_package)
                 save_flashcards_text(original_flashcards, "flashcards.txt")
                 print(f"✓ Exported {len(original_flashcards.flashcards)} flashcards to {output_file}")
         
@@ -264,8 +388,9 @@ def create_flashcards(
         return flashcards
     
     finally:
-        # Clean up uploaded file unless user wants to keep it
-        if file_id and not keep_file:
+        # Clean up uploaded file unless user wants to keep it (a reused upload
+        # was kept by an earlier run, so it is not ours to delete)
+        if file_id and not keep_file and not reused_upload:
             cleanup_file(file_id)
 
 
@@ -282,12 +407,17 @@ Examples:
   python main.py transcript.txt --model gpt-4o-mini --iterations 3
   python main.py lecture_notes.pdf --verbose
   python main.py 03-GNN1.pdf --deck "Graph Neural Networks" --model gpt-4o --iterations 1
+  python main.py week1.pdf week2.pdf --deck "CS 224W" --combined-output course.apkg
+  python main.py week*.pdf --deck "CS 224W" --combined-output course.apkg --batch
         """
     )
     
     parser.add_argument(
-        "input_file",
-        help="Path to the PDF or text file (.pdf, .txt, .text) to generate flashcards from"
+        "input_files",
+        nargs="*",
+        metavar="input_file",
+        help="Path to the PDF or text file (.pdf, .txt, .text) to generate flashcards from; "
+             "several files need --combined-output"
     )
     
     parser.add_argument(
@@ -303,6 +433,20 @@ Examples:
         help="OpenAI model to use (default: gpt-4o)"
     )
     
+    parser.add_argument(
+        "--critic-model",
+        default=None,
+        choices=["gpt-4o", "gpt-4o-mini", "o1"],
+        help="Model for critiques (default: --model); escalates to --model after two rejections in a row"
+    )
+    
+    parser.add_argument(
+        "--reviser-model",
+        default=None,
+        choices=["gpt-4o", "gpt-4o-mini", "o1"],
+        help="Model for revisions (default: --model)"
+    )
+    
     parser.add_argument(
         "--iterations",
         type=int,
@@ -319,7 +463,7 @@ Examples:
     parser.add_argument(
         "--keep-file",
         action="store_true",
-        help="Keep uploaded file on OpenAI servers (default: delete after use)"
+        help="Keep uploaded file on OpenAI servers so later runs on the same PDF skip the upload (default: delete after use)"
     )
     
     parser.add_argument(
@@ -328,25 +472,137 @@ Examples:
         help="Enable interactive study session with adaptive learning"
     )
     
+    parser.add_argument(
+        "--replay",
+        metavar="RATINGS_FILE",
+        default=None,
+        help="Run the study session non-interactively with recorded ratings (1-5, one per card, comma or line separated)"
+    )
+    
+    parser.add_argument(
+        "--pages-per-chunk",
+        type=int,
+        default=PDF_PAGES_PER_CHUNK,
+        help="Split PDFs into chunks of this many pages and generate from them concurrently (requires pypdf; default: off)"
+    )
+    
+    parser.add_argument(
+        "--refine-chunks",
+        action="store_true",
+        help="With --pages-per-chunk, critique and revise each chunk as soon as it is generated, pipelined across chunks"
+    )
+    
+    parser.add_argument(
+        "--per-card-critique",
+        action="store_true",
+        help="Critique each flashcard independently (one request) and revise only the flagged cards"
+    )
+    
+    parser.add_argument(
+        "--single-call",
+        action="store_true",
+        help="Critique and revise in a single request per iteration instead of two (uses the critic model)"
+    )
+    
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="After the first revision, skip the critique when local checks find no obvious problems"
+    )
+    
+    parser.add_argument(
+        "--combined-output",
+        default=None,
+        help="Write one .apkg with a subdeck per input file to this path (e.g. course.apkg)"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Generate the initial decks for all input files through the OpenAI Batch API (half price, may take hours); critique/revision stay online"
+    )
+    
+    parser.add_argument(
+        "--purge-file-cache",
+        action="store_true",
+        help="Delete the PDF uploads kept with --keep-file (which later runs reuse) from OpenAI, then continue"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached generation/critique/revision results and always call the API (same as FLASHCARD_NO_CACHE=1)"
+    )
+    
     args = parser.parse_args()
     
+    if args.no_cache:
+        llm_cache.CACHE_ENABLED = False
+    
     # Set logging level based on verbose flag
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
         logging.info("Verbose mode enabled - all flashcards will be logged")
     
-    if not os.path.exists(args.input_file):
-        print(f"Error: File not found: {args.input_file}")
-        logging.error(f"File not found: {args.input_file}")
-        exit(1)
+    if args.purge_file_cache:
+        purge_file_cache()
+        if not args.input_files:
+            exit(0)
+    
+    if not args.input_files:
+        parser.error("at least one input file is required")
+    if len(args.input_files) > 1 and not args.combined_output:
+        parser.error("several input files require --combined-output")
+    if len(args.input_files) > 1 and args.replay:
+        parser.error("--replay takes the ratings of a single input file")
+    replay_ratings = load_ratings(args.replay) if args.replay else None
+    
+    for input_file in args.input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: File not found: {input_file}")
+            logging.error(f"File not found: {input_file}")
+            exit(1)
     
     print(f"Log file: {log_file}")
     
-    create_flashcards(
-        args.input_file,
-        args.deck,
-        args.model,
-        args.iterations,
-        args.keep_file,
-        args.study_session
-    )
\ No newline at end of file
+    # With --combined-output every file's deck goes into one package that is
+    # written once at the end, instead of one package write per file
+    anki_package = genanki.Package([]) if args.combined_output else None
+    
+    # With --batch every initial deck comes from one Batch API job; documents
+    # whose batch request failed are generated online as usual. The batch's
+    # uploads are passed on so no PDF is uploaded twice
+    prepared_inputs = [None] * len(args.input_files)
+    initial_sets = [None] * len(args.input_files)
+    if args.batch:
+        prepared_inputs, initial_sets = generate_flashcards_batch(args.input_files, args.model)
+    
+    for input_file, prepared_input, initial_flashcards in zip(args.input_files, prepared_inputs, initial_sets):
+        deck_name = args.deck
+        eval_dir = eval_data_subdir
+        if len(args.input_files) > 1:
+            deck_name = f"{args.deck}::{Path(input_file).stem}"
+            eval_dir = eval_data_subdir / Path(input_file).stem
+        create_flashcards(
+            input_file,
+            deck_name,
+            args.model,
+            args.iterations,
+            args.keep_file,
+            args.study_session or replay_ratings is not None,
+            args.pages_per_chunk,
+            args.per_card_critique,
+            args.preflight,
+            anki_package,
+            args.critic_model,
+            args.reviser_model,
+            args.refine_chunks,
+            initial_flashcards,
+            replay_ratings,
+            args.single_call,
+            prepared_input,
+            eval_dir
+        )
+    
+    if anki_package is not None:
+        write_anki_package(anki_package, args.combined_output)
@@ -1,7 +1,8 @@
 """Pydantic models for flashcard data structures."""
 
+from functools import cached_property
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 
 
 class Flashcard(BaseModel):
@@ -12,8 +13,36 @@ class Flashcard(BaseModel):
 
 class FlashcardSet(BaseModel):
     """Collection of flashcards."""
+    # Frozen so the cached prompt representations below can never go stale
+    model_config = ConfigDict(frozen=True)
+
     flashcards: list[Flashcard]
 
+    @cached_property
+    def prompt_text(self) -> str:
+        """Numbered one-line-per-card listing used by critique/revise prompts."""
+        return "\n".join(
+            f"{i+1}. Q: {fc.question} | A: {fc.answer}"
+            for i, fc in enumerate(self.flashcards)
+        )
+
+    @cached_property
+    def canonical_order(self) -> "FlashcardSet":
+        """
+        The same cards sorted by content, so the same cards in any order give an
+        identical prompt_text (and OpenAI prefix-cache hit). Critique and revise
+        this set together - its card numbers differ from the original order.
+        """
+        return FlashcardSet(flashcards=sorted(self.flashcards, key=lambda fc: (fc.question, fc.answer)))
+
+    @cached_property
+    def evaluation_text(self) -> str:
+        """Multi-line per-card listing used by LLM-as-a-judge evaluation prompts."""
+        return "\n".join(
+            f"Card {i+1}:\nQ: {fc.question}\nA: {fc.answer}\n"
+            for i, fc in enumerate(self.flashcards)
+        )
+
 
 class Critique(BaseModel):
     """AI critique of flashcard quality."""
@@ -22,6 +51,54 @@ class Critique(BaseModel):
     issues: list[str]
 
 
+class CritiquePrediction(Critique):
+    """Critique parsed from loosely-typed DSPy output (bool/list fields may arrive as strings)."""
+
+    @field_validator("is_acceptable", mode="before")
+    @classmethod
+    def _coerce_is_acceptable(cls, value):
+        if isinstance(value, str):
+            lowered = value.lower()
+            return "true" in lowered or "yes" in lowered
+        return bool(value)
+
+    @field_validator("issues", mode="before")
+    @classmethod
+    def _split_issues(cls, value):
+        if isinstance(value, str):
+            return [issue.strip() for issue in value.split("\n") if issue.strip()]
+        return value if isinstance(value, list) else []
+
+
+class CardCritique(BaseModel):
+    """Critique of a single flashcard, returned as part of a CardCritiqueSet."""
+    card_number: int  # 1-based number of the card in the critiqued set
+    is_acceptable: bool
+    issues: list[str]
+
+
+class CardCritiqueSet(BaseModel):
+    """Per-card critiques for a whole deck from a single request."""
+    critiques: list[CardCritique]  # One per flashcard
+
+
+class CardRevision(BaseModel):
+    """Replacement cards for one flagged flashcard (several if it was split)."""
+    card_number: int  # 1-based number of the card being replaced
+    flashcards: list[Flashcard]
+
+
+class CardRevisionSet(BaseModel):
+    """Revisions for the flagged flashcards of a deck."""
+    revisions: list[CardRevision]  # One per flagged card
+
+
+class CritiqueAndRevision(BaseModel):
+    """Critique of a deck and, if it is not acceptable, its revision from the same request."""
+    critique: Critique
+    revised_flashcards: list[Flashcard]  # Complete revised deck; empty when acceptable
+
+
 class StudyRating(BaseModel):
     """Individual flashcard rating from user."""
     flashcard_index: int  # Which card (0-based)
@@ -70,6 +147,11 @@ class DeckEvaluation(BaseModel):
     overall_deck_score: Optional[float] = None  # Computed from flashcard_evaluations - not from LLM
 
 
+class MultiDeckEvaluation(BaseModel):
+    """Evaluations of several flashcard decks (stages) returned by one judge call."""
+    deck_evaluations: list[DeckEvaluation]  # One per deck, in the order they were given
+
+
 class GapCardEvaluation(BaseModel):
     """Evaluation of how well new cards address a specific gap."""
     gap_description: str  # The identified gap
@@ -87,6 +169,16 @@ class RemovalEvaluation(BaseModel):
     removal_feedback: str  # Explanation
 
 
+class GapOnlyEvaluation(BaseModel):
+    """Gap-filling half of an adaptation evaluation (when gaps and removals are judged separately)."""
+    gap_evaluations: list[GapCardEvaluation]  # One per identified gap
+
+
+class RemovalOnlyEvaluation(BaseModel):
+    """Removal half of an adaptation evaluation (when gaps and removals are judged separately)."""
+    removal_evaluations: list[RemovalEvaluation]  # One per removed card
+
+
 class AdaptationEvaluation(BaseModel):
     """Evaluation of the adaptation stage."""
     gap_evaluations: list[GapCardEvaluation]  # One per identified gap
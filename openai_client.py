@@ -1,38 +1,203 @@
 """OpenAI API interaction functions."""
 
+import asyncio
+import hashlib
+import io
+import logging
+import time
 from pathlib import Path
-from openai.lib._pydantic import to_strict_json_schema
 
-from config import client
-from models import FlashcardSet, Flashcard, Critique, KnowledgeGaps
-
-
-def upload_pdf(file_path: str) -> str:
-    """Upload a PDF file to OpenAI using the Files API."""
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+from config import (
+    get_client,
+    get_async_client,
+    cached_schema,
+    GENERATION_CONCURRENCY,
+    FILE_ID_CACHE_PATH,
+    FILE_ID_CACHE_TTL_DAYS,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from llm_cache import ResponseCache, cached_model_call, make_key
+from semantic_cache import SemanticCache, embed_text, aembed_text
+from json_io import dumps, parse_model_json, read_json, write_json
+from models import (
+    FlashcardSet,
+    Flashcard,
+    Critique,
+    KnowledgeGaps,
+    CardCritiqueSet,
+    CardRevisionSet,
+    CritiqueAndRevision,
+)
+
+
+log = logging.getLogger(__name__)
+
+# Strict response schemas, converted once at import instead of on every request
+_FLASHCARD_SET_SCHEMA = cached_schema(FlashcardSet)
+_CRITIQUE_SCHEMA = cached_schema(Critique)
+_KNOWLEDGE_GAPS_SCHEMA = cached_schema(KnowledgeGaps)
+_CARD_CRITIQUE_SET_SCHEMA = cached_schema(CardCritiqueSet)
+_CARD_REVISION_SET_SCHEMA = cached_schema(CardRevisionSet)
+_CRITIQUE_AND_REVISION_SCHEMA = cached_schema(CritiqueAndRevision)
+
+# Generated decks keyed by request, with PDFs identified by content; see _generation_cache_key
+_generation_cache = ResponseCache("generations")
+# Critiques keyed by the exact request (the deck's prompt text and model)
+_critique_cache = ResponseCache("critiques")
+# Gap analyses keyed by the exact prompt (the ratings text and model)
+_gap_analysis_cache = ResponseCache("knowledge_gaps")
+# file_id -> SHA-256 of the uploaded PDF bytes, for files uploaded by this process
+_file_digests: dict[str, str] = {}
+# Critiques of near-identical decks (opt-in, see config.SEMANTIC_CACHE_THRESHOLD)
+_critique_semantic_cache = SemanticCache("critiques", SEMANTIC_CACHE_THRESHOLD)
+# Gap analyses of near-identical study sessions (same opt-in threshold)
+_gap_analysis_semantic_cache = SemanticCache("knowledge_gaps", SEMANTIC_CACHE_THRESHOLD)
+
+
+def _pdf_path(file_path: str) -> Path:
+    """Check that file_path names an existing PDF."""
     file_path_obj = Path(file_path)
     if not file_path_obj.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
     
     if file_path_obj.suffix.lower() != '.pdf':
         raise ValueError(f"File must be a PDF. Got: {file_path_obj.suffix}")
+    return file_path_obj
+
+
+def _load_file_ids() -> dict[str, dict]:
+    """Read the SHA-256 -> {"file_id", "uploaded_at"} map of uploads kept on OpenAI."""
+    if not FILE_ID_CACHE_PATH or not Path(FILE_ID_CACHE_PATH).exists():
+        return {}
+    return read_json(FILE_ID_CACHE_PATH)
+
+
+def _record_file_id(digest: str, file_id: str | None) -> None:
+    """Add (or with file_id=None, drop) an entry of the uploaded-file map."""
+    if not FILE_ID_CACHE_PATH:
+        return
+    file_ids = _load_file_ids()
+    if file_id is None:
+        file_ids.pop(digest, None)
+    else:
+        file_ids[digest] = {"file_id": file_id, "uploaded_at": time.time()}
+    write_json(FILE_ID_CACHE_PATH, file_ids)
+
+
+def _kept_file_id(digest: str) -> str | None:
+    """
+    file_id of a kept upload of these bytes, if recorded. Uploads older than
+    FILE_ID_CACHE_TTL_DAYS are deleted instead, so kept files don't
+    accumulate storage costs indefinitely.
+    """
+    entry = _load_file_ids().get(digest)
+    if entry is None:
+        return None
+    if time.time() - entry["uploaded_at"] > FILE_ID_CACHE_TTL_DAYS * 86400:
+        _file_digests[entry["file_id"]] = digest
+        cleanup_file(entry["file_id"])
+        return None
+    return entry["file_id"]
+
+
+def upload_pdf(file_path: str) -> tuple[str, bool]:
+    """
+    Upload a PDF file to OpenAI using the Files API.
     
-    print(f"Uploading {file_path_obj.name}...")
+    A previous upload of the same bytes that is still on OpenAI (kept with
+    --keep-file) is reused instead of uploading again.
     
-    with open(file_path, "rb") as file:
-        uploaded_file = client.files.create(
-            file=file,
-            purpose="user_data"
-        )
+    Returns (file_id, reused); a reused file belongs to an earlier run, so
+    callers should not delete it when they are done.
+    """
+    from openai import NotFoundError
+    
+    file_path_obj = _pdf_path(file_path)
+    data = file_path_obj.read_bytes()
+    # Remember the content hash so generation results can be cached across
+    # runs, where the same PDF gets a new file_id on every upload
+    digest = hashlib.sha256(data).hexdigest()
     
-    print(f"File uploaded successfully. ID: {uploaded_file.id}")
-    return uploaded_file.id
+    file_id = _kept_file_id(digest)
+    if file_id:
+        try:
+            get_client().files.retrieve(file_id)
+            _file_digests[file_id] = digest
+            log.info("Reusing uploaded file for %s. ID: %s", file_path_obj.name, file_id)
+            return file_id, True
+        except NotFoundError:
+            _record_file_id(digest, None)
+    
+    log.info("Uploading %s...", file_path_obj.name)
+    uploaded_file = get_client().files.create(
+        file=(file_path_obj.name, data),
+        purpose="user_data"
+    )
+    _file_digests[uploaded_file.id] = digest
+    _record_file_id(digest, uploaded_file.id)
+    
+    log.info("File uploaded successfully. ID: %s", uploaded_file.id)
+    return uploaded_file.id, False
+
+
+async def aupload_pdf(file_path: str) -> tuple[str, bool]:
+    """Async variant of upload_pdf; the disk read runs in a worker thread."""
+    from openai import NotFoundError
+    
+    file_path_obj = _pdf_path(file_path)
+    data = await asyncio.to_thread(file_path_obj.read_bytes)
+    digest = hashlib.sha256(data).hexdigest()
+    
+    file_id = _kept_file_id(digest)
+    if file_id:
+        try:
+            await get_async_client().files.retrieve(file_id)
+            _file_digests[file_id] = digest
+            log.info("Reusing uploaded file for %s. ID: %s", file_path_obj.name, file_id)
+            return file_id, True
+        except NotFoundError:
+            _record_file_id(digest, None)
+    
+    log.info("Uploading %s...", file_path_obj.name)
+    uploaded_file = await get_async_client().files.create(
+        file=(file_path_obj.name, data, "application/pdf"),
+        purpose="user_data"
+    )
+    _file_digests[uploaded_file.id] = digest
+    _record_file_id(digest, uploaded_file.id)
+    
+    log.info("File uploaded successfully. ID: %s", uploaded_file.id)
+    return uploaded_file.id, False
 
 
-def prepare_input(file_path: str) -> tuple[str | None, str | None]:
+def split_pdf(file_path: str, pages_per_chunk: int) -> list[bytes]:
+    """Split a PDF into consecutive page ranges, returned as in-memory PDF documents."""
+    if PdfReader is None:
+        raise ImportError("Splitting PDFs requires pypdf (pip install pypdf)")
+    
+    reader = PdfReader(file_path)
+    chunks = []
+    for start in range(0, len(reader.pages), pages_per_chunk):
+        writer = PdfWriter()
+        for page in reader.pages[start:start + pages_per_chunk]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+def prepare_input(file_path: str) -> tuple[str | None, str | None, bool]:
     """
-    Prepare input file for processing. Returns (file_id, text_content).
-    For PDFs: returns (file_id, None)
-    For text files: returns (None, text_content)
+    Prepare input file for processing. Returns (file_id, text_content, reused).
+    For PDFs: returns (file_id, None, reused), where reused means the file_id
+    is a kept upload from an earlier run that should not be cleaned up
+    For text files: returns (None, text_content, False)
     """
     file_path_obj = Path(file_path)
     if not file_path_obj.exists():
@@ -42,71 +207,81 @@ def prepare_input(file_path: str) -> tuple[str | None, str | None]:
     
     if suffix == '.pdf':
         # Upload PDF and return file_id
-        file_id = upload_pdf(file_path)
-        return (file_id, None)
+        file_id, reused = upload_pdf(file_path)
+        return (file_id, None, reused)
     elif suffix in ['.txt', '.text']:
         # Read text file content
-        print(f"Reading text file: {file_path_obj.name}...")
+        log.info("Reading text file: %s...", file_path_obj.name)
         with open(file_path, "r", encoding="utf-8") as f:
             text_content = f.read()
-        print(f"Text file read successfully ({len(text_content)} characters)")
-        return (None, text_content)
+        log.info("Text file read successfully (%d characters)", len(text_content))
+        return (None, text_content, False)
     else:
         raise ValueError(f"Unsupported file type: {suffix}. Supported types: .pdf, .txt, .text")
 
 
 def cleanup_file(file_id: str) -> None:
     """Delete the uploaded file to avoid storage costs."""
-    import logging
     try:
-        client.files.delete(file_id)
-        print(f"File {file_id} deleted successfully.")
-        logging.info(f"Deleted uploaded file: {file_id}")
+        get_client().files.delete(file_id)
+        log.info("File %s deleted successfully.", file_id)
     except Exception as e:
-        print(f"Error deleting file {file_id}: {e}")
-        logging.error(f"Error deleting file {file_id}: {e}")
+        log.error("Error deleting file %s: %s", file_id, e)
+    if file_id in _file_digests:
+        _record_file_id(_file_digests[file_id], None)
 
 
-def generate_flashcards(file_id: str | None = None, text_content: str | None = None, model: str = "gpt-4o") -> FlashcardSet:
-    """
-    Generate flashcards using either an uploaded file ID (for PDFs) or text content (for text files).
-    Must provide exactly one of file_id or text_content.
-    """
+def purge_file_cache() -> None:
+    """Delete every kept upload recorded for reuse and forget them."""
+    for digest, entry in _load_file_ids().items():
+        _file_digests[entry["file_id"]] = digest
+        cleanup_file(entry["file_id"])
+
+
+_GENERATE_PDF_INSTRUCTIONS = "Generate comprehensive flashcards from this document. Include information from any diagrams, charts, or images."
+
+_GENERATE_PDF_SYSTEM_PROMPT = f"""You are an expert at creating flashcards for spaced repetition learning.
+
+{_GENERATE_PDF_INSTRUCTIONS}"""
+
+_GENERATE_TEXT_INSTRUCTIONS = "Generate comprehensive flashcards from this lecture transcript/text. Create flashcards that cover the key concepts, definitions, and important information from this text."
+
+_GENERATE_TEXT_SYSTEM_PROMPT = f"""You are an expert at creating flashcards for spaced repetition learning.
+
+{_GENERATE_TEXT_INSTRUCTIONS}"""
+
+
+def _generate_request(file_id: str | None, text_content: str | None, model: str) -> dict:
+    """Chat completion kwargs for generating a deck from a PDF file_id or text content."""
     if (file_id is None) == (text_content is None):
         raise ValueError("Must provide exactly one of file_id or text_content")
     
-    print(f"Calling OpenAI API ({model}) to generate flashcards...")
-    
-    # Build user content based on input type
+    # Static instructions lead each user message and the source comes last,
+    # so requests share the longest possible prefix for OpenAI prompt caching
     if file_id:
         # PDF file - use file attachment
         user_content = [
+            {
+                "type": "text",
+                "text": _GENERATE_PDF_INSTRUCTIONS
+            },
             {
                 "type": "file",
                 "file": {
                     "file_id": file_id
                 }
-            },
-            {
-                "type": "text",
-                "text": "Generate comprehensive flashcards from this document. Include information from any diagrams, charts, or images."
             }
         ]
-        system_content = """You are an expert at creating flashcards for spaced repetition learning.
-
-Generate comprehensive flashcards from this document. Include information from any diagrams, charts, or images."""
+        system_content = _GENERATE_PDF_SYSTEM_PROMPT
     else:
         # Text file - include content directly
-        user_content = f"""Generate comprehensive flashcards from this lecture transcript/text:
-
-{text_content}
+        user_content = f"""{_GENERATE_TEXT_INSTRUCTIONS}
 
-Create flashcards that cover the key concepts, definitions, and important information from this text."""
-        system_content = """You are an expert at creating flashcards for spaced repetition learning.
-
-Generate comprehensive flashcards from this lecture transcript/text. Create flashcards that cover the key concepts, definitions, and important information from this text."""
+Lecture transcript/text:
+{text_content}"""
+        system_content = _GENERATE_TEXT_SYSTEM_PROMPT
     
-    response = client.chat.completions.create(
+    return dict(
         model=model,
         messages=[
             {
@@ -122,30 +297,132 @@ Generate comprehensive flashcards from this lecture transcript/text. Create flas
             "type": "json_schema",
             "json_schema": {
                 "name": "flashcard_set",
-                "schema": to_strict_json_schema(FlashcardSet),
+                "schema": _FLASHCARD_SET_SCHEMA,
                 "strict": True
             }
         }
     )
+
+
+def _generation_cache_key(request: dict, file_id: str | None, model: str) -> str | None:
+    """
+    Cache key for a generation request. A PDF gets a new file_id on every
+    upload, so the key uses the same request built with the uploaded bytes'
+    hash in place of the file_id; files this process did not upload have
+    unknown content and are not cached.
+    """
+    if file_id is None:
+        return make_key(request)
+    digest = _file_digests.get(file_id)
+    if digest is None:
+        return None
+    return make_key(_generate_request(digest, None, model))
+
+
+def generate_flashcards(file_id: str | None = None, text_content: str | None = None, model: str = "gpt-4o") -> FlashcardSet:
+    """
+    Generate flashcards using either an uploaded file ID (for PDFs) or text content (for text files).
+    Must provide exactly one of file_id or text_content.
+    """
+    request = _generate_request(file_id, text_content, model)
+    key = _generation_cache_key(request, file_id, model)
+    cached = _generation_cache.get(key) if key else None
+    if cached is not None:
+        log.info("Using cached flashcards for this source")
+        return parse_model_json(FlashcardSet, cached)
     
-    return FlashcardSet.model_validate_json(response.choices[0].message.content)
+    log.info("Calling OpenAI API (%s) to generate flashcards...", model)
+    response = get_client().chat.completions.create(**request)
+    content = response.choices[0].message.content
+    if key:
+        _generation_cache.set(key, content)
+    return parse_model_json(FlashcardSet, content)
+
+
+async def agenerate_flashcards(file_id: str | None = None, text_content: str | None = None, model: str = "gpt-4o") -> FlashcardSet:
+    """Async version of generate_flashcards (AsyncOpenAI), e.g. to gather several documents."""
+    request = _generate_request(file_id, text_content, model)
+    key = _generation_cache_key(request, file_id, model)
+    cached = _generation_cache.get(key) if key else None
+    if cached is not None:
+        log.info("Using cached flashcards for this source")
+        return parse_model_json(FlashcardSet, cached)
+    
+    log.info("Calling OpenAI API (%s) to generate flashcards...", model)
+    response = await get_async_client().chat.completions.create(**request)
+    content = response.choices[0].message.content
+    if key:
+        _generation_cache.set(key, content)
+    return parse_model_json(FlashcardSet, content)
 
 
-def critique_flashcards(flashcard_set: FlashcardSet, model: str = "gpt-4o") -> Critique:
-    """Critique flashcards for quality."""
-    from config import client
-    from openai.lib._pydantic import to_strict_json_schema
+async def _map_pdf_chunks(file_path: str, pages_per_chunk: int, process_chunk) -> list:
+    """
+    Split a PDF into page ranges, upload them concurrently and gather
+    `await process_chunk(file_id)` for every chunk, in page order. The chunk
+    uploads are deleted afterwards.
+    """
+    chunks = split_pdf(file_path, pages_per_chunk)
+    name = Path(file_path).stem
+    log.info("Generating flashcards from %d chunks of %d pages...", len(chunks), pages_per_chunk)
     
-    flashcard_text = "\n".join([f"{i+1}. Q: {fc.question} | A: {fc.answer}" 
-                                 for i, fc in enumerate(flashcard_set.flashcards)])
+    client = get_async_client()
+    uploads = await asyncio.gather(*(
+        client.files.create(file=(f"{name}_part{i+1}.pdf", chunk), purpose="user_data")
+        for i, chunk in enumerate(chunks)
+    ))
+    for upload, chunk in zip(uploads, chunks):
+        _file_digests[upload.id] = hashlib.sha256(chunk).hexdigest()
     
-    print(f"Critiquing flashcards with {model}...")
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": """You are an expert educational evaluator specializing in flashcard quality assessment for long-term learning and spaced repetition.
+    try:
+        results = await asyncio.gather(*(process_chunk(upload.id) for upload in uploads))
+    finally:
+        await asyncio.gather(
+            *(client.files.delete(upload.id) for upload in uploads),
+            return_exceptions=True
+        )
+    
+    log.info("Generated flashcards from %d PDF chunks", len(chunks))
+    return results
+
+
+def _merge_flashcard_sets(flashcard_sets) -> FlashcardSet:
+    """Concatenate decks in order."""
+    return FlashcardSet(flashcards=[fc for flashcard_set in flashcard_sets for fc in flashcard_set.flashcards])
+
+
+async def agenerate_flashcards_chunked(
+    file_path: str,
+    pages_per_chunk: int,
+    model: str = "gpt-4o",
+    concurrency: int = GENERATION_CONCURRENCY
+) -> FlashcardSet:
+    """
+    Generate flashcards for a long PDF by splitting it into page ranges,
+    uploading and generating from each range concurrently (at most
+    `concurrency` generation requests in flight) and merging the decks in
+    page order. The chunk uploads are deleted afterwards.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def generate_chunk(file_id: str) -> FlashcardSet:
+        async with semaphore:
+            return await agenerate_flashcards(file_id=file_id, model=model)
+    
+    return _merge_flashcard_sets(await _map_pdf_chunks(file_path, pages_per_chunk, generate_chunk))
+
+
+def generate_flashcards_chunked(
+    file_path: str,
+    pages_per_chunk: int,
+    model: str = "gpt-4o",
+    concurrency: int = GENERATION_CONCURRENCY
+) -> FlashcardSet:
+    """Sync wrapper around agenerate_flashcards_chunked."""
+    return asyncio.run(agenerate_flashcards_chunked(file_path, pages_per_chunk, model, concurrency))
+
+
+_CRITIQUE_SYSTEM_PROMPT = """You are an expert educational evaluator specializing in flashcard quality assessment for long-term learning and spaced repetition.
 
 OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
 
@@ -160,6 +437,20 @@ Evaluate these flashcards against four atomic, independent quality metrics. Each
 4. ACCURACY: The information in the flashcard must be factually correct and free from errors. Verify that all facts, definitions, and explanations are accurate.
 
 For each flashcard, identify specific issues related to these four metrics. Determine if the flashcards are acceptable or need revision."""
+
+_REVISE_SYSTEM_PROMPT = "You are an expert at refining flashcards based on pedagogical feedback. \n\nOVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.\n\nRevise the flashcards to address the feedback below. When making revisions, ensure each flashcard meets these four quality criteria:\n1. ATOMICITY: One clear concept per card\n2. CLARITY: Unambiguous, precise, and complete questions/answers\n3. LEARNING VALUE: Promotes active recall and deep understanding\n4. ACCURACY: Factually correct and free from errors\n\nFocus on addressing the specific feedback and issues identified."
+
+
+def _critique_request(flashcard_set: FlashcardSet, model: str) -> dict:
+    """Chat completion kwargs for critiquing flashcard_set."""
+    flashcard_text = flashcard_set.prompt_text
+    
+    return dict(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": _CRITIQUE_SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -170,30 +461,84 @@ For each flashcard, identify specific issues related to these four metrics. Dete
             "type": "json_schema",
             "json_schema": {
                 "name": "critique",
-                "schema": to_strict_json_schema(Critique),
+                "schema": _CRITIQUE_SCHEMA,
                 "strict": True
             }
         }
     )
-    
-    return Critique.model_validate_json(response.choices[0].message.content)
 
 
-def revise_flashcards(flashcard_set: FlashcardSet, critique: Critique, model: str = "gpt-4o") -> FlashcardSet:
-    """Revise flashcards based on critique."""
-    from config import client
-    from openai.lib._pydantic import to_strict_json_schema
+def _critique_semantic_scope(flashcard_set: FlashcardSet, model: str) -> str:
+    """Exact-match part of a critique semantic lookup: prompt, model and card count."""
+    return make_key(_CRITIQUE_SYSTEM_PROMPT, model, len(flashcard_set.flashcards))
+
+
+# Verdicts are cached on the exact deck and model, so re-running the pipeline on
+# unchanged cards (e.g. to regenerate the Anki output) skips the critique call.
+# Near-identical decks can also reuse a verdict via the semantic cache (opt-in);
+# such a verdict is approximate, so it is never stored as this deck's exact one
+def critique_flashcards(flashcard_set: FlashcardSet, model: str = "gpt-4o") -> Critique:
+    """Critique flashcards for quality."""
+    request = _critique_request(flashcard_set, model)
+    key = make_key(request)
+    cached = _critique_cache.get(key)
+    if cached is not None:
+        return parse_model_json(Critique, cached)
+    
+    embedding = None
+    if _critique_semantic_cache.enabled:
+        scope = _critique_semantic_scope(flashcard_set, model)
+        embedding = embed_text(flashcard_set.prompt_text)
+        cached = _critique_semantic_cache.lookup(embedding, scope)
+        if cached is not None:
+            return parse_model_json(Critique, cached)
+    
+    log.info("Critiquing flashcards with %s...", model)
+    response = get_client().chat.completions.create(**request)
+    content = response.choices[0].message.content
+    _critique_cache.set(key, content)
+    if embedding is not None:
+        _critique_semantic_cache.add(embedding, scope, content)
+    return parse_model_json(Critique, content)
+
+
+async def acritique_flashcards(flashcard_set: FlashcardSet, model: str = "gpt-4o") -> Critique:
+    """Async version of critique_flashcards."""
+    request = _critique_request(flashcard_set, model)
+    key = make_key(request)
+    cached = _critique_cache.get(key)
+    if cached is not None:
+        return parse_model_json(Critique, cached)
+    
+    embedding = None
+    if _critique_semantic_cache.enabled:
+        scope = _critique_semantic_scope(flashcard_set, model)
+        embedding = await aembed_text(flashcard_set.prompt_text)
+        cached = _critique_semantic_cache.lookup(embedding, scope)
+        if cached is not None:
+            return parse_model_json(Critique, cached)
     
-    flashcard_text = "\n".join([f"{i+1}. Q: {fc.question} | A: {fc.answer}" 
-                                 for i, fc in enumerate(flashcard_set.flashcards)])
+    log.info("Critiquing flashcards with %s...", model)
+    response = await get_async_client().chat.completions.create(**request)
+    content = response.choices[0].message.content
+    _critique_cache.set(key, content)
+    if embedding is not None:
+        _critique_semantic_cache.add(embedding, scope, content)
+    return parse_model_json(Critique, content)
+
+
+def _revise_request(flashcard_set: FlashcardSet, critique: Critique, model: str) -> dict:
+    """Chat completion kwargs for revising flashcard_set according to critique."""
+    # prompt_text is cached on the (frozen) set, so repeated iterations reuse it
+    flashcard_text = flashcard_set.prompt_text
+    issues_text = "\n".join([f"- {issue}" for issue in critique.issues])
     
-    print(f"Revising flashcards with {model}...")
-    response = client.chat.completions.create(
+    return dict(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": "You are an expert at refining flashcards based on pedagogical feedback. \n\nOVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.\n\nRevise the flashcards to address the feedback below. When making revisions, ensure each flashcard meets these four quality criteria:\n1. ATOMICITY: One clear concept per card\n2. CLARITY: Unambiguous, precise, and complete questions/answers\n3. LEARNING VALUE: Promotes active recall and deep understanding\n4. ACCURACY: Factually correct and free from errors\n\nFocus on addressing the specific feedback and issues identified."
+                "content": _REVISE_SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -206,26 +551,248 @@ Feedback:
 {critique.feedback}
 
 Issues to address:
-{chr(10).join(f'- {issue}' for issue in critique.issues)}"""
+{issues_text}"""
             }
         ],
         response_format={
             "type": "json_schema",
             "json_schema": {
                 "name": "flashcard_set",
-                "schema": to_strict_json_schema(FlashcardSet),
+                "schema": _FLASHCARD_SET_SCHEMA,
+                "strict": True
+            }
+        }
+    )
+
+
+@cached_model_call("revisions", FlashcardSet)
+def revise_flashcards(flashcard_set: FlashcardSet, critique: Critique, model: str = "gpt-4o") -> FlashcardSet:
+    """Revise flashcards based on critique."""
+    log.info("Revising flashcards with %s...", model)
+    response = get_client().chat.completions.create(**_revise_request(flashcard_set, critique, model))
+    return parse_model_json(FlashcardSet, response.choices[0].message.content)
+
+
+@cached_model_call("revisions", FlashcardSet)
+async def arevise_flashcards(flashcard_set: FlashcardSet, critique: Critique, model: str = "gpt-4o") -> FlashcardSet:
+    """Async version of revise_flashcards."""
+    log.info("Revising flashcards with %s...", model)
+    response = await get_async_client().chat.completions.create(**_revise_request(flashcard_set, critique, model))
+    return parse_model_json(FlashcardSet, response.choices[0].message.content)
+
+
+async def agenerate_and_refine_chunked(
+    file_path: str,
+    pages_per_chunk: int,
+    max_iterations: int,
+    model: str = "gpt-4o",
+    critic_model: str | None = None,
+    reviser_model: str | None = None,
+    concurrency: int = GENERATION_CONCURRENCY
+) -> tuple[FlashcardSet, FlashcardSet]:
+    """
+    Like agenerate_flashcards_chunked, but each chunk also runs its own
+    critique/revise loop (up to `max_iterations` rounds) as soon as it is
+    generated. Chunks move through the loop independently, so one chunk's
+    critique overlaps with other chunks' generation and revision instead of
+    waiting for the whole deck. At most `concurrency` requests are in flight.
+    
+    Returns (initial deck, refined deck), both merged in page order.
+    """
+    critic_model = critic_model or model
+    reviser_model = reviser_model or model
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def process_chunk(file_id: str) -> tuple[FlashcardSet, FlashcardSet]:
+        async with semaphore:
+            initial = await agenerate_flashcards(file_id=file_id, model=model)
+        flashcard_set = initial
+        for _ in range(max_iterations):
+            async with semaphore:
+                critique = await acritique_flashcards(flashcard_set, critic_model)
+            if critique.is_acceptable:
+                break
+            async with semaphore:
+                flashcard_set = await arevise_flashcards(flashcard_set, critique, reviser_model)
+        return initial, flashcard_set
+    
+    results = await _map_pdf_chunks(file_path, pages_per_chunk, process_chunk)
+    return (
+        _merge_flashcard_sets(initial for initial, _ in results),
+        _merge_flashcard_sets(refined for _, refined in results),
+    )
+
+
+def generate_and_refine_chunked(
+    file_path: str,
+    pages_per_chunk: int,
+    max_iterations: int,
+    model: str = "gpt-4o",
+    critic_model: str | None = None,
+    reviser_model: str | None = None,
+    concurrency: int = GENERATION_CONCURRENCY
+) -> tuple[FlashcardSet, FlashcardSet]:
+    """Sync wrapper around agenerate_and_refine_chunked."""
+    return asyncio.run(agenerate_and_refine_chunked(
+        file_path, pages_per_chunk, max_iterations, model, critic_model, reviser_model, concurrency
+    ))
+
+
+_CRITIQUE_AND_REVISE_SYSTEM_PROMPT = f"""{_CRITIQUE_SYSTEM_PROMPT}
+
+If the flashcards are not acceptable, also revise them in the same response: return the complete revised set in revised_flashcards, addressing every issue you identified while keeping each card atomic, clear, valuable for learning and accurate. If they are acceptable, return an empty revised_flashcards list."""
+
+
+def _critique_and_revise_request(flashcard_set: FlashcardSet, model: str) -> dict:
+    """Chat completion kwargs for critiquing flashcard_set and revising it in one response."""
+    return dict(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": _CRITIQUE_AND_REVISE_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"Critique these flashcards and revise them if needed:\n\n{flashcard_set.prompt_text}"
+            }
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "critique_and_revision",
+                "schema": _CRITIQUE_AND_REVISION_SCHEMA,
+                "strict": True
+            }
+        }
+    )
+
+
+@cached_model_call("critique_revisions", CritiqueAndRevision)
+def critique_and_revise_flashcards(flashcard_set: FlashcardSet, model: str = "gpt-4o") -> CritiqueAndRevision:
+    """
+    Critique flashcards and, if they are not acceptable, revise them in the
+    same request - one round trip per iteration instead of two.
+    """
+    log.info("Critiquing and revising flashcards with %s...", model)
+    response = get_client().chat.completions.create(**_critique_and_revise_request(flashcard_set, model))
+    return parse_model_json(CritiqueAndRevision, response.choices[0].message.content)
+
+
+def _card_critique_request(flashcard_set: FlashcardSet, model: str) -> dict:
+    """Chat completion kwargs for critiquing every card of flashcard_set independently in one request."""
+    cards_json = dumps([
+        {"card_number": i + 1, "question": fc.question, "answer": fc.answer}
+        for i, fc in enumerate(flashcard_set.flashcards)
+    ]).decode("utf-8")
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": _CRITIQUE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": "Critique each of these flashcards independently. Return exactly one critique per "
+                           f"card_number, marking each card acceptable or not with its own issues:\n\n{cards_json}"
+            }
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "card_critique_set",
+                "schema": _CARD_CRITIQUE_SET_SCHEMA,
+                "strict": True
+            }
+        }
+    )
+
+
+@cached_model_call("card_critiques", CardCritiqueSet)
+def critique_flashcards_per_card(flashcard_set: FlashcardSet, model: str = "gpt-4o") -> CardCritiqueSet:
+    """Critique each flashcard independently, all in a single request."""
+    log.info("Critiquing %d flashcards individually with %s...", len(flashcard_set.flashcards), model)
+    response = get_client().chat.completions.create(**_card_critique_request(flashcard_set, model))
+    return parse_model_json(CardCritiqueSet, response.choices[0].message.content)
+
+
+def revise_flagged_flashcards(
+    flashcard_set: FlashcardSet,
+    card_critiques: CardCritiqueSet,
+    model: str = "gpt-4o"
+) -> FlashcardSet:
+    """
+    Revise only the cards whose per-card critique is not acceptable and splice
+    the replacements back in place; acceptable cards are kept verbatim and are
+    not sent to the model. A flagged card the model did not revise is kept.
+    """
+    num_cards = len(flashcard_set.flashcards)
+    flagged = {
+        critique.card_number: critique.issues
+        for critique in card_critiques.critiques
+        if not critique.is_acceptable and 1 <= critique.card_number <= num_cards
+    }
+    if not flagged:
+        return flashcard_set
+    
+    cards_json = dumps([
+        {
+            "card_number": number,
+            "question": flashcard_set.flashcards[number - 1].question,
+            "answer": flashcard_set.flashcards[number - 1].answer,
+            "issues": issues
+        }
+        for number, issues in sorted(flagged.items())
+    ]).decode("utf-8")
+    
+    log.info("Revising %d flagged flashcards with %s...", len(flagged), model)
+    response = get_client().chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": _REVISE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": "Revise each of these flashcards to address its issues. Return one revision per "
+                           "card_number; a card may be replaced by several cards if it should be split:\n\n"
+                           f"{cards_json}"
+            }
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "card_revision_set",
+                "schema": _CARD_REVISION_SET_SCHEMA,
                 "strict": True
             }
         }
     )
+    revisions = parse_model_json(CardRevisionSet, response.choices[0].message.content)
+    replacements = {
+        revision.card_number: revision.flashcards
+        for revision in revisions.revisions
+        if revision.card_number in flagged
+    }
     
-    return FlashcardSet.model_validate_json(response.choices[0].message.content)
+    revised = []
+    for i, fc in enumerate(flashcard_set.flashcards):
+        revised.extend(replacements.get(i + 1, [fc]))
+    return FlashcardSet(flashcards=revised)
+
+
+_GAP_ANALYSIS_SYSTEM_PROMPT = "You are an expert learning analyst. Analyze student performance on flashcards to identify knowledge gaps and recommend improvements. Be specific and actionable."
+
+_GAP_ANALYSIS_INSTRUCTIONS = """Analyze the flashcard ratings below.
+
+Identify:
+1. Strong areas (concepts rated 1-2, they've mastered)
+2. Weak areas (concepts rated 3-4, need improvement)
+3. Critical knowledge gaps (rated 5, major misconceptions or missing prerequisites)
+4. Which mastered cards (rated 1) could be safely removed
+5. What new flashcards should be generated to fill gaps (be specific about concepts)
+
+Provide actionable recommendations with clear reasoning."""
 
 
 def analyze_knowledge_gaps(session, file_id: str | None = None, text_content: str | None = None, model: str = "gpt-4o") -> KnowledgeGaps:
     """Use AI to analyze ratings and identify knowledge gaps."""
-    from config import client
-    from openai.lib._pydantic import to_strict_json_schema
     
     # Format session data for AI
     flashcard_ratings = []
@@ -238,42 +805,82 @@ def analyze_knowledge_gaps(session, file_id: str | None = None, text_content: st
     
     ratings_text = "\n".join(flashcard_ratings)
     
-    print("Analyzing your knowledge gaps...")
-    response = client.chat.completions.create(
+    # The prompt only depends on the ratings text, so the same ratings (e.g. a
+    # re-run over a saved session) skip the call regardless of file_id/timestamp
+    key = make_key(_GAP_ANALYSIS_SYSTEM_PROMPT, _GAP_ANALYSIS_INSTRUCTIONS, ratings_text, model)
+    cached = _gap_analysis_cache.get(key)
+    if cached is not None:
+        log.info("Using cached knowledge gap analysis")
+        return parse_model_json(KnowledgeGaps, cached)
+    
+    embedding = None
+    if _gap_analysis_semantic_cache.enabled:
+        # The difficulty digits are a tiny part of the embedded text, so the
+        # exact rating vector is part of the scope: only card wording may vary
+        scope = make_key(_GAP_ANALYSIS_SYSTEM_PROMPT, model, [r.difficulty for r in session.ratings])
+        embedding = embed_text(ratings_text)
+        cached = _gap_analysis_semantic_cache.lookup(embedding, scope)
+        if cached is not None:
+            return parse_model_json(KnowledgeGaps, cached)
+    
+    log.info("Analyzing your knowledge gaps...")
+    response = get_client().chat.completions.create(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": """You are an expert learning analyst. Analyze student performance on flashcards
-                to identify knowledge gaps and recommend improvements. Be specific and actionable."""
+                "content": _GAP_ANALYSIS_SYSTEM_PROMPT
             },
             {
                 "role": "user",
-                "content": f"""Analyze these flashcard ratings:
-
-{ratings_text}
-
-Identify:
-1. Strong areas (concepts rated 1-2, they've mastered)
-2. Weak areas (concepts rated 3-4, need improvement) 
-3. Critical knowledge gaps (rated 5, major misconceptions or missing prerequisites)
-4. Which mastered cards (rated 1) could be safely removed
-5. What new flashcards should be generated to fill gaps (be specific about concepts)
+                "content": f"""{_GAP_ANALYSIS_INSTRUCTIONS}
 
-Provide actionable recommendations with clear reasoning."""
+Flashcard ratings:
+{ratings_text}"""
             }
         ],
         response_format={
             "type": "json_schema",
             "json_schema": {
                 "name": "knowledge_gaps",
-                "schema": to_strict_json_schema(KnowledgeGaps),
+                "schema": _KNOWLEDGE_GAPS_SCHEMA,
                 "strict": True
             }
         }
     )
-    
-    return KnowledgeGaps.model_validate_json(response.choices[0].message.content)
+    content = response.choices[0].message.content
+    _gap_analysis_cache.set(key, content)
+    if embedding is not None:
+        _gap_analysis_semantic_cache.add(embedding, scope, content)
+    return parse_model_json(KnowledgeGaps, content)
+
+
+_GAP_FILLING_SYSTEM_PROMPT = """You are an expert at creating targeted flashcards to help students fill specific knowledge gaps.
+
+OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
+
+Create flashcards that directly and effectively address the identified knowledge gaps. Each card should target a specific gap and help the student understand concepts they struggled with. While addressing gaps, ensure each card also meets these four quality criteria:
+
+1. ATOMICITY: Each card should focus on ONE clear, atomic concept. Break down complex gaps into simpler, focused cards.
+
+2. CLARITY: Use clear, unambiguous, and complete questions and answers. Since the student struggled with these concepts, provide necessary context. The answer should fully address the question.
+
+3. LEARNING VALUE: Design cards that promote active recall and deep understanding. Use "why" and "how" questions rather than simple fact recall.
+
+4. ACCURACY: The information in the flashcard must be factually correct and free from errors. Verify that all facts, definitions, and explanations are accurate.
+
+Create focused flashcards that effectively address the exact gaps identified while maintaining quality on these four metrics."""
+
+_GAP_FILLING_INSTRUCTIONS = """Generate flashcards that specifically address the knowledge gaps listed below.
+
+Create focused flashcards that:
+- Address the exact gaps identified
+- Use simpler language if student struggled
+- Provide step-by-step breakdowns for complex concepts
+- Include examples where helpful
+- Are designed to scaffold learning (build up from basics)
+
+Generate approximately 5-8 flashcards tailored to these gaps."""
 
 
 def generate_gap_filling_cards(gaps: KnowledgeGaps, file_id: str | None = None, text_content: str | None = None, model: str = "gpt-4o") -> list[Flashcard]:
@@ -281,12 +888,9 @@ def generate_gap_filling_cards(gaps: KnowledgeGaps, file_id: str | None = None,
     Generate new flashcards specifically for identified gaps.
     Must provide exactly one of file_id or text_content.
     """
-    from config import client
-    from openai.lib._pydantic import to_strict_json_schema
-    import logging
     
     if not gaps.critical_gaps and not gaps.weak_areas:
-        logging.info("No gaps identified, skipping card generation")
+        log.info("No gaps identified, skipping card generation")
         return []
     
     if (file_id is None) == (text_content is None):
@@ -302,68 +906,39 @@ def generate_gap_filling_cards(gaps: KnowledgeGaps, file_id: str | None = None,
             f"- {area}" for area in gaps.weak_areas
         ])
     
-    print("Generating gap-filling flashcards...")
+    log.info("Generating gap-filling flashcards...")
     
-    # Build user content based on input type
+    # Static instructions first, then the source, then this session's gaps
+    gaps_section = f"Knowledge gaps:\n{gap_summary}"
     if file_id:
         user_content = [
+            {
+                "type": "text",
+                "text": _GAP_FILLING_INSTRUCTIONS
+            },
             {
                 "type": "file",
                 "file": {"file_id": file_id}
             },
             {
                 "type": "text",
-                "text": f"""Generate flashcards that specifically address these knowledge gaps:
-
-{gap_summary}
-
-Create focused flashcards that:
-- Address the exact gaps identified
-- Use simpler language if student struggled
-- Provide step-by-step breakdowns for complex concepts
-- Include examples where helpful
-- Are designed to scaffold learning (build up from basics)
-
-Generate approximately 5-8 flashcards tailored to these gaps."""
+                "text": gaps_section
             }
         ]
     else:
-        user_content = f"""Generate flashcards that specifically address these knowledge gaps from the original lecture transcript:
-
-{gap_summary}
+        user_content = f"""{_GAP_FILLING_INSTRUCTIONS}
 
 Original lecture transcript:
 {text_content}
 
-Create focused flashcards that:
-- Address the exact gaps identified
-- Use simpler language if student struggled
-- Provide step-by-step breakdowns for complex concepts
-- Include examples where helpful
-- Are designed to scaffold learning (build up from basics)
-
-Generate approximately 5-8 flashcards tailored to these gaps."""
+{gaps_section}"""
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": """You are an expert at creating targeted flashcards to help students fill specific knowledge gaps.
-
-OVERARCHING GOAL: These flashcards are designed for long-term understanding and spaced repetition of lecture material. They should help students master important concepts through active recall and deep understanding, not just surface memorization.
-
-Create flashcards that directly and effectively address the identified knowledge gaps. Each card should target a specific gap and help the student understand concepts they struggled with. While addressing gaps, ensure each card also meets these four quality criteria:
-
-1. ATOMICITY: Each card should focus on ONE clear, atomic concept. Break down complex gaps into simpler, focused cards.
-
-2. CLARITY: Use clear, unambiguous, and complete questions and answers. Since the student struggled with these concepts, provide necessary context. The answer should fully address the question.
-
-3. LEARNING VALUE: Design cards that promote active recall and deep understanding. Use "why" and "how" questions rather than simple fact recall.
-
-4. ACCURACY: The information in the flashcard must be factually correct and free from errors. Verify that all facts, definitions, and explanations are accurate.
-
-Create focused flashcards that effectively address the exact gaps identified while maintaining quality on these four metrics."""
+                "content": _GAP_FILLING_SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -374,12 +949,12 @@ Create focused flashcards that effectively address the exact gaps identified whi
             "type": "json_schema",
             "json_schema": {
                 "name": "flashcard_set",
-                "schema": to_strict_json_schema(FlashcardSet),
+                "schema": _FLASHCARD_SET_SCHEMA,
                 "strict": True
             }
         }
     )
     
-    new_flashcards = FlashcardSet.model_validate_json(response.choices[0].message.content)
+    new_flashcards = parse_model_json(FlashcardSet, response.choices[0].message.content)
     return new_flashcards.flashcards
 
@@ -9,7 +9,6 @@ This script:
 """
 
 import argparse
-import json
 from pathlib import Path
 from typing import List
 
@@ -20,8 +19,31 @@ except ImportError:
     exit(1)
 
 from models import FlashcardSet, KnowledgeGaps, StudySession
+from json_io import read_json, write_json
+from token_utils import truncate_to_tokens
+from config import SOURCE_MATERIAL_MAX_TOKENS
+from llm_cache import CACHE_DIR, make_key
 from dspy_modules import CritiqueModule, AdaptationModule
 from dspy_metrics import critique_metric, adaptation_metric
+from dspy_integration import OpenAILM
+
+# Metric calls are OpenAI-latency bound and thread-safe (shared client, locked
+# caches), so the optimizer evaluates candidates over the trainset in parallel
+DEFAULT_NUM_THREADS = 8
+
+# Compiled programs are cached on disk keyed by (trainset, optimizer config, model),
+# so re-running with unchanged data and settings skips the optimizer entirely
+COMPILE_CACHE_DIR = Path(CACHE_DIR) / "dspy_compile" if CACHE_DIR else None
+
+
+def _run_dirs(eval_dir: Path) -> List[Path]:
+    """Directories holding one run's data: evaluation_data/<timestamp>/, or
+    evaluation_data/<timestamp>/<file name>/ for multi-file runs."""
+    return sorted(
+        metadata_path.parent
+        for pattern in ("*/evaluation_metadata.json", "*/*/evaluation_metadata.json")
+        for metadata_path in eval_dir.glob(pattern)
+    )
 
 
 def load_critique_examples(eval_data_dir: Path, max_examples: int = 20) -> List[dspy.Example]:
@@ -29,32 +51,23 @@ def load_critique_examples(eval_data_dir: Path, max_examples: int = 20) -> List[
     examples = []
     eval_dir = Path(eval_data_dir)
     
-    for subdir in sorted(eval_dir.iterdir()):
-        if not subdir.is_dir():
-            continue
-        
+    for subdir in _run_dirs(eval_dir):
         initial_path = subdir / "flashcards_initial.json"
         if initial_path.exists():
             try:
-                with open(initial_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    flashcard_set = FlashcardSet.model_validate(data)
-                    
-                    # Format flashcard text for DSPy
-                    flashcard_text = "\n".join([
-                        f"{i+1}. Q: {fc.question} | A: {fc.answer}"
-                        for i, fc in enumerate(flashcard_set.flashcards)
-                    ])
-                    
-                    example = dspy.Example(
-                        flashcard_set=flashcard_set,
-                        flashcard_text=flashcard_text
-                    ).with_inputs('flashcard_text')
-                    
-                    examples.append(example)
-                    
-                    if len(examples) >= max_examples:
-                        break
+                # Cards in content order so reordered sets share a prompt prefix;
+                # the metric revises this same set, so card numbers line up
+                flashcard_set = FlashcardSet.model_validate(read_json(initial_path)).canonical_order
+                
+                example = dspy.Example(
+                    flashcard_set=flashcard_set,
+                    flashcard_text=flashcard_set.prompt_text
+                ).with_inputs('flashcard_text')
+                
+                examples.append(example)
+                
+                if len(examples) >= max_examples:
+                    break
             except Exception as e:
                 print(f"Warning: Could not load {initial_path}: {e}")
                 continue
@@ -67,10 +80,7 @@ def load_adaptation_examples(eval_data_dir: Path, max_examples: int = 10) -> Lis
     examples = []
     eval_dir = Path(eval_data_dir)
     
-    for subdir in sorted(eval_dir.iterdir()):
-        if not subdir.is_dir():
-            continue
-        
+    for subdir in _run_dirs(eval_dir):
         # Need: knowledge_gaps, study_session, flashcards_revised (original), source_text
         gaps_path = subdir / "knowledge_gaps.json"
         session_path = subdir / "study_session.json"
@@ -82,19 +92,13 @@ def load_adaptation_examples(eval_data_dir: Path, max_examples: int = 10) -> Lis
         
         try:
             # Load knowledge gaps
-            with open(gaps_path, 'r', encoding='utf-8') as f:
-                gaps_data = json.load(f)
-                knowledge_gaps = KnowledgeGaps.model_validate(gaps_data)
+            knowledge_gaps = KnowledgeGaps.model_validate(read_json(gaps_path))
             
             # Load study session
-            with open(session_path, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
-                study_session = StudySession.model_validate(session_data)
+            study_session = StudySession.model_validate(read_json(session_path))
             
             # Load original flashcards
-            with open(original_path, 'r', encoding='utf-8') as f:
-                original_data = json.load(f)
-                original_flashcards = FlashcardSet.model_validate(original_data)
+            original_flashcards = FlashcardSet.model_validate(read_json(original_path))
             
             # Load source material (optional)
             source_material = None
@@ -111,9 +115,9 @@ def load_adaptation_examples(eval_data_dir: Path, max_examples: int = 10) -> Lis
                     f"- {area}" for area in knowledge_gaps.weak_areas
                 ])
             
-            # Truncate source material if too long
-            if source_material and len(source_material) > 5000:
-                source_material = source_material[:5000] + "..."
+            # Truncate source material the same way dspy_integration does at inference time
+            if source_material:
+                source_material = truncate_to_tokens(source_material, SOURCE_MATERIAL_MAX_TOKENS)
             
             example = dspy.Example(
                 knowledge_gaps=knowledge_gaps,
@@ -137,39 +141,51 @@ def load_adaptation_examples(eval_data_dir: Path, max_examples: int = 10) -> Lis
 
 def setup_dspy_lm(model: str = "gpt-4o"):
     """Set up DSPy with OpenAI LM."""
-    import os
-    from openai import OpenAI
-    
-    # Create a simple OpenAI LM wrapper for DSPy
-    class OpenAILM(dspy.LM):
-        def __init__(self, model_name: str):
-            super().__init__(model_name)
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            self.model_name = model_name
-        
-        def __call__(self, prompt, **kwargs):
-            messages = []
-            if hasattr(prompt, 'messages'):
-                messages = prompt.messages
-            elif isinstance(prompt, str):
-                messages = [{"role": "user", "content": prompt}]
-            elif isinstance(prompt, list):
-                messages = prompt
-            
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
-    
     lm = OpenAILM(model)
     dspy.configure(lm=lm)
     return lm
 
 
-def optimize_critique_module(valset: List[dspy.Example], num_candidates: int = 10):
-    """Optimize the critique module."""
+def compile_cache_path(module_name: str, trainset: List[dspy.Example], optimizer_config: dict, model: str) -> Path | None:
+    """Path of the cached compiled program for this exact optimization run (None if caching is off)."""
+    if COMPILE_CACHE_DIR is None:
+        return None
+    key = make_key(
+        module_name,
+        [example.toDict() for example in trainset],
+        optimizer_config,
+        model,
+        getattr(dspy, "__version__", None)
+    )
+    return COMPILE_CACHE_DIR / f"{key}.json"
+
+
+def load_compiled(module, cache_path: Path | None):
+    """Load a previously compiled program into module, or return None on a miss."""
+    if cache_path is None or not cache_path.exists():
+        return None
+    try:
+        module.load(str(cache_path))
+    except Exception as e:
+        print(f"Warning: Could not load cached program {cache_path}: {e}")
+        return None
+    print(f"✓ Loaded compiled program from cache: {cache_path}")
+    return module
+
+
+def save_compiled(module, cache_path: Path | None) -> None:
+    """Store a compiled program's state so identical re-runs can skip compilation."""
+    if cache_path is None:
+        return
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        module.save(str(cache_path))
+    except Exception as e:
+        print(f"Warning: Could not cache compiled program: {e}")
+
+
+def optimize_critique_module(valset: List[dspy.Example], num_candidates: int = 10, num_threads: int = DEFAULT_NUM_THREADS, model: str = "gpt-4o"):
+    """Optimize the critique module (metric calls run on num_threads threads)."""
     print(f"\n{'='*60}")
     print("Optimizing Critique Module")
     print(f"{'='*60}")
@@ -177,6 +193,16 @@ def optimize_critique_module(valset: List[dspy.Example], num_candidates: int = 1
     
     critique_module = CritiqueModule()
     
+    cache_path = compile_cache_path(
+        "critique",
+        valset,
+        {"metric": "critique_metric", "num_candidates": num_candidates},
+        model
+    )
+    cached = load_compiled(critique_module, cache_path)
+    if cached is not None:
+        return cached
+    
     # Use MIPRO for optimization
     try:
         optimizer = dspy.teleprompt.MIPRO(
@@ -190,18 +216,22 @@ def optimize_critique_module(valset: List[dspy.Example], num_candidates: int = 1
             critique_module,
             trainset=valset,
             valset=valset,
-            num_threads=4
+            num_threads=num_threads
         )
         
         print("✓ Critique optimization complete!")
+        save_compiled(optimized_critique, cache_path)
         return optimized_critique
         
     except AttributeError:
-        # Fallback to BootstrapFewShot if MIPRO not available
-        print("MIPRO not available, using BootstrapFewShot...")
-        optimizer = dspy.BootstrapFewShot(
-            max_bootstrapped_demos=4,
-            max_labeled_demos=16
+        # Fallback to BootstrapFewShotWithRandomSearch if MIPRO not available
+        print("MIPRO not available, using BootstrapFewShotWithRandomSearch...")
+        optimizer = dspy.BootstrapFewShotWithRandomSearch(
+            metric=critique_metric,
+            max_bootstrapped_demos=3,
+            max_labeled_demos=3,
+            num_candidate_programs=num_candidates,
+            num_threads=num_threads
         )
         
         optimized_critique = optimizer.compile(
@@ -211,11 +241,12 @@ def optimize_critique_module(valset: List[dspy.Example], num_candidates: int = 1
         )
         
         print("✓ Critique optimization complete!")
+        save_compiled(optimized_critique, cache_path)
         return optimized_critique
 
 
-def optimize_adaptation_module(valset: List[dspy.Example], num_candidates: int = 10):
-    """Optimize the adaptation module."""
+def optimize_adaptation_module(valset: List[dspy.Example], num_candidates: int = 10, num_threads: int = DEFAULT_NUM_THREADS, model: str = "gpt-4o"):
+    """Optimize the adaptation module (metric calls run on num_threads threads)."""
     print(f"\n{'='*60}")
     print("Optimizing Adaptation Module")
     print(f"{'='*60}")
@@ -223,6 +254,16 @@ def optimize_adaptation_module(valset: List[dspy.Example], num_candidates: int =
     
     adaptation_module = AdaptationModule()
     
+    cache_path = compile_cache_path(
+        "adaptation",
+        valset,
+        {"metric": "adaptation_metric", "num_candidates": num_candidates},
+        model
+    )
+    cached = load_compiled(adaptation_module, cache_path)
+    if cached is not None:
+        return cached
+    
     # Use MIPRO for optimization
     try:
         optimizer = dspy.teleprompt.MIPRO(
@@ -236,18 +277,22 @@ def optimize_adaptation_module(valset: List[dspy.Example], num_candidates: int =
             adaptation_module,
             trainset=valset,
             valset=valset,
-            num_threads=4
+            num_threads=num_threads
         )
         
         print("✓ Adaptation optimization complete!")
+        save_compiled(optimized_adaptive, cache_path)
         return optimized_adaptive
         
     except AttributeError:
-        # Fallback to BootstrapFewShot if MIPRO not available
-        print("MIPRO not available, using BootstrapFewShot...")
-        optimizer = dspy.BootstrapFewShot(
-            max_bootstrapped_demos=4,
-            max_labeled_demos=16
+        # Fallback to BootstrapFewShotWithRandomSearch if MIPRO not available
+        print("MIPRO not available, using BootstrapFewShotWithRandomSearch...")
+        optimizer = dspy.BootstrapFewShotWithRandomSearch(
+            metric=adaptation_metric,
+            max_bootstrapped_demos=3,
+            max_labeled_demos=3,
+            num_candidate_programs=num_candidates,
+            num_threads=num_threads
         )
         
         optimized_adaptive = optimizer.compile(
@@ -257,6 +302,7 @@ def optimize_adaptation_module(valset: List[dspy.Example], num_candidates: int =
         )
         
         print("✓ Adaptation optimization complete!")
+        save_compiled(optimized_adaptive, cache_path)
         return optimized_adaptive
 
 
@@ -272,8 +318,7 @@ def save_optimized_prompts(module, output_path: Path, module_name: str):
         "note": "This module has been optimized by DSPy. Use dspy_integration.py to load and use it."
     }
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(prompt_info, f, indent=2)
+    write_json(output_path, prompt_info)
     
     print(f"Saved optimization info to: {output_path}")
     print("Note: DSPy modules are Python objects. To use optimized prompts, integrate via dspy_integration.py")
@@ -313,6 +358,12 @@ def main():
         default=10,
         help="Number of prompt candidates to try (for MIPRO)"
     )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        default=DEFAULT_NUM_THREADS,
+        help=f"Number of threads for parallel metric evaluation (default: {DEFAULT_NUM_THREADS})"
+    )
     parser.add_argument(
         "--max-examples",
         type=int,
@@ -343,7 +394,7 @@ def main():
         if len(critique_examples) == 0:
             print("Warning: No critique examples found. Skipping critique optimization.")
         else:
-            optimized_critique = optimize_critique_module(critique_examples, args.num_candidates)
+            optimized_critique = optimize_critique_module(critique_examples, args.num_candidates, args.num_threads, args.model)
             save_optimized_prompts(
                 optimized_critique,
                 output_dir / "critique_optimized.json",
@@ -359,7 +410,7 @@ def main():
             print("Warning: No adaptation examples found. Skipping adaptation optimization.")
             print("Note: Adaptation examples require knowledge_gaps.json, study_session.json, and flashcards_revised.json")
         else:
-            optimized_adaptive = optimize_adaptation_module(adaptation_examples, args.num_candidates)
+            optimized_adaptive = optimize_adaptation_module(adaptation_examples, args.num_candidates, args.num_threads, args.model)
             save_optimized_prompts(
                 optimized_adaptive,
                 output_dir / "adaptation_optimized.json",
@@ -0,0 +1,113 @@
+"""Embedding-similarity cache for LLM results (opt-in).
+
+An exact-match cache misses whenever a card is reworded. This cache embeds the
+payload that varies between calls and, if a previous payload with the same
+scope is at least `threshold` cosine-similar, returns that call's stored result.
+Entries are appended to a JSONL file on disk so they survive between runs.
+"""
+
+import logging
+import math
+import threading
+from pathlib import Path
+
+from config import EMBEDDING_MODEL, get_client, get_async_client
+from json_io import dumps, loads
+import llm_cache
+
+log = logging.getLogger(__name__)
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def embed_text(text: str) -> list[float]:
+    """Return the (unit-length) embedding of text."""
+    response = get_client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+    return _normalize(response.data[0].embedding)
+
+
+async def aembed_text(text: str) -> list[float]:
+    """Async version of embed_text."""
+    response = await get_async_client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+    return _normalize(response.data[0].embedding)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache over unit embeddings, partitioned by an exact scope key.
+    
+    The scope holds everything that must match exactly (model, source, schema
+    version, card count); only entries in the same scope are compared.
+    A threshold of 0 disables the cache.
+    """
+
+    def __init__(self, namespace: str, threshold: float, cache_dir: str | None = llm_cache.CACHE_DIR, max_entries: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: dict[str, list[tuple[list[float], str]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._path = Path(cache_dir) / "semantic" / f"{namespace}.jsonl" if cache_dir else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and llm_cache.CACHE_ENABLED
+
+    def _load(self) -> None:
+        # Called with the lock held
+        self._loaded = True
+        if self._path is None:
+            return
+        try:
+            lines = self._path.read_bytes().splitlines()
+        except OSError:
+            return
+        for line in lines[-self.max_entries:]:
+            try:
+                entry = loads(line)
+            except ValueError:
+                continue
+            self._entries.setdefault(entry["scope"], []).append((entry["embedding"], entry["value"]))
+
+    def lookup(self, embedding: list[float], scope: str) -> str | None:
+        """Return the value of the most similar entry in scope, if it clears the threshold."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            candidates = list(self._entries.get(scope, ()))
+        
+        best_score, best_value = 0.0, None
+        for stored, value in candidates:
+            score = sum(a * b for a, b in zip(embedding, stored))
+            if score > best_score:
+                best_score, best_value = score, value
+        if best_score >= self.threshold:
+            log.info("Semantic cache hit (similarity %.3f)", best_score)
+            return best_value
+        return None
+
+    def add(self, embedding: list[float], scope: str, value: str) -> None:
+        """Store value for embedding in scope (in memory and appended to disk)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entries = self._entries.setdefault(scope, [])
+            entries.append((embedding, value))
+            if len(entries) > self.max_entries:
+                del entries[0]
+            if self._path is None:
+                return
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self._path, "ab") as f:
+                    f.write(dumps({"scope": scope, "embedding": embedding, "value": value}) + b"\n")
+            except OSError:
+                # Disk persistence is best-effort, like the exact-match cache
+                pass
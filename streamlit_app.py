@@ -148,7 +148,7 @@ def main():
                         try:
                             # Prepare input (upload PDF or read text file)
                             progress_bar = st.progress(0, text="Processing file...")
-                            file_id, text_content = prepare_input(tmp_path)
+                            file_id, text_content, _ = prepare_input(tmp_path)
                             
                             if file_id:
                                 progress_bar.progress(20, text="File uploaded. Generating flashcards...")
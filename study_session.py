@@ -1,11 +1,22 @@
 """Study session and adaptive learning functionality."""
 
+from collections import Counter
 from datetime import datetime
+from pathlib import Path
 import logging
 
 from models import FlashcardSet, StudySession, StudyRating, KnowledgeGaps, AdaptiveUpdate
 from openai_client import analyze_knowledge_gaps, generate_gap_filling_cards
 
+# Difficulty rating -> label shown in the session summary
+RATING_LABELS = {
+    1: "know well",
+    2: "easy",
+    3: "moderate",
+    4: "difficult",
+    5: "very difficult",
+}
+
 
 def conduct_study_session(flashcard_set: FlashcardSet) -> StudySession:
     """Interactive study session - collects difficulty ratings from user."""
@@ -53,18 +64,13 @@ def conduct_study_session(flashcard_set: FlashcardSet) -> StudySession:
     print("STUDY SESSION COMPLETE")
     print(f"{'='*60}\n")
     
-    rating_summary = {
-        "1 (know well)": sum(1 for r in ratings if r.difficulty == 1),
-        "2 (easy)": sum(1 for r in ratings if r.difficulty == 2),
-        "3 (moderate)": sum(1 for r in ratings if r.difficulty == 3),
-        "4 (difficult)": sum(1 for r in ratings if r.difficulty == 4),
-        "5 (very difficult)": sum(1 for r in ratings if r.difficulty == 5),
-    }
+    # Count every difficulty in one pass over the ratings
+    counts = Counter(r.difficulty for r in ratings)
     
     print("You rated flashcards:")
-    for difficulty, count in rating_summary.items():
-        if count > 0:
-            print(f"  - {difficulty}: {count} cards")
+    for difficulty, label in RATING_LABELS.items():
+        if counts[difficulty] > 0:
+            print(f"  - {difficulty} ({label}): {counts[difficulty]} cards")
     
     return StudySession(
         flashcards=flashcard_set.flashcards,
@@ -73,6 +79,32 @@ def conduct_study_session(flashcard_set: FlashcardSet) -> StudySession:
     )
 
 
+def load_ratings(path: str) -> list[int]:
+    """
+    Read difficulty ratings (1-5) for a replayed study session: one per card
+    in deck order, separated by commas, whitespace or newlines.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    ratings = [int(token) for token in text.replace(",", " ").split()]
+    invalid = [r for r in ratings if not 1 <= r <= 5]
+    if invalid:
+        raise ValueError(f"Ratings must be between 1 and 5, got: {invalid}")
+    return ratings
+
+
+def replay_study_session(flashcard_set: FlashcardSet, ratings: list[int]) -> StudySession:
+    """Build a study session from recorded ratings instead of asking for them."""
+    if len(ratings) != len(flashcard_set.flashcards):
+        raise ValueError(
+            f"Got {len(ratings)} ratings for a deck of {len(flashcard_set.flashcards)} flashcards"
+        )
+    return StudySession(
+        flashcards=flashcard_set.flashcards,
+        ratings=[StudyRating(flashcard_index=i, difficulty=d) for i, d in enumerate(ratings)],
+        timestamp=datetime.now().isoformat()
+    )
+
+
 def adaptive_update_flashcards(
     original: FlashcardSet,
     session: StudySession,
@@ -84,10 +116,7 @@ def adaptive_update_flashcards(
     """Apply adaptive updates: remove mastered cards, add gap-filling cards"""
     
     # Identify mastered cards (rated 1) to remove
-    mastered_indices = set()
-    for rating in session.ratings:
-        if rating.difficulty == 1:
-            mastered_indices.add(rating.flashcard_index)
+    mastered_indices = {r.flashcard_index for r in session.ratings if r.difficulty == 1}
     
     removed_cards = [original.flashcards[i] for i in mastered_indices]
     logging.info(f"Identified {len(removed_cards)} mastered cards for removal")
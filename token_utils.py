@@ -0,0 +1,40 @@
+"""Token-aware truncation of source material (uses tiktoken when installed)."""
+
+import functools
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough characters-per-token ratio for English, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4o"):
+    """Return the (cached) tiktoken encoding for model."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@functools.lru_cache(maxsize=64)
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """
+    Truncate text to at most max_tokens tokens, cutting on a token boundary.
+    Appends "..." when the text was truncated so the result is deterministic.
+    
+    Results are memoized: every stage of a run trims the same source document,
+    so only the first call pays for tokenization.
+    """
+    if not tiktoken:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + "..."